@@ -1,8 +1,52 @@
 from datetime import datetime
 
+SBS_DATETIME_FORMAT = "%Y/%m/%d %H:%M:%S.%f"
+
+# Consecutive messages almost always share the date and second, so the last decoded prefix is kept.
+_cached_date: str | None = None
+_cached_second: str | None = None
+_cached_datetime: datetime | None = None
+_cached_formatted_datetime: datetime | None = None
+_cached_formatted_strings: (str, str) = ("", "")
+
+
+def parse_sbs_datetime(date_str: str, time_str: str) -> datetime:
+    """
+    Decodes the fixed 'YYYY/MM/DD' and 'HH:MM:SS.fff' layout of SBS messages without strptime. Other layouts are
+    passed on to strptime, which raises the usual ValueError for malformed values.
+    """
+    global _cached_date, _cached_second, _cached_datetime
+    if (len(date_str) != 10 or len(time_str) < 10 or date_str[4] != "/" or date_str[7] != "/"
+            or time_str[2] != ":" or time_str[5] != ":" or time_str[8] != "."):
+        return datetime.strptime(f"{date_str} {time_str}", SBS_DATETIME_FORMAT)
+
+    fraction = time_str[9:]
+    if len(fraction) > 6 or not fraction.isdigit():
+        return datetime.strptime(f"{date_str} {time_str}", SBS_DATETIME_FORMAT)
+    microsecond = int(fraction) * 10 ** (6 - len(fraction))
+
+    if date_str != _cached_date or not time_str.startswith(_cached_second):
+        if not (date_str[:4] + date_str[5:7] + date_str[8:] + time_str[:2] + time_str[3:5] + time_str[6:8]).isdigit():
+            return datetime.strptime(f"{date_str} {time_str}", SBS_DATETIME_FORMAT)
+        _cached_datetime = datetime(int(date_str[:4]), int(date_str[5:7]), int(date_str[8:]),
+                                    int(time_str[:2]), int(time_str[3:5]), int(time_str[6:8]))
+        _cached_date = date_str
+        _cached_second = time_str[:8]
+    return _cached_datetime.replace(microsecond=microsecond)
+
+
+def format_sbs_datetime(value: datetime) -> (str, str):
+    """Formats a datetime into the SBS date and time strings. Decoded batches share one timestamp, so it is cached."""
+    global _cached_formatted_datetime, _cached_formatted_strings
+    if value != _cached_formatted_datetime:
+        _cached_formatted_datetime = value
+        _cached_formatted_strings = (value.strftime("%Y/%m/%d"), value.strftime("%H:%M:%S.%f")[:-3])
+    return _cached_formatted_strings
+
 
 class SBSMessage:
     def __init__(self, raw_message, aircraft_data):
+        self._generated_datetime = None
         raw_message = raw_message.replace(" ", "")
         fields = raw_message.split(",")
         try:
@@ -35,6 +79,39 @@ class SBSMessage:
         except IndexError:
             pass
 
+    @classmethod
+    def from_values(cls, aircraft_data, transmission_type: str, hex_ident: str, generated: datetime, callsign="",
+                    altitude="", ground_speed="", track="", latitude="", longitude="", vertical_rate=""):
+        """Creates a message from already decoded values, e.g. from the Beast binary feed."""
+        message = cls.__new__(cls)
+        message._generated_datetime = generated
+        message.message_type = "MSG"
+        message.transmission_type = transmission_type
+        message.session_id = ""
+        message.aircraft_id = ""
+        message.hex_ident = hex_ident
+        message.flight_id = ""
+        message.date_generated, message.time_generated = format_sbs_datetime(generated)
+        message.date_logged = message.date_generated
+        message.time_logged = message.time_generated
+        message.callsign = callsign
+        message.altitude = altitude
+        message.ground_speed = ground_speed
+        message.track = track
+        message.latitude = latitude
+        message.longitude = longitude
+        message.vertical_rate = vertical_rate
+        message.squawk = ""
+        message.alert = ""
+        message.emergency = ""
+        message.spi = ""
+        message.is_on_ground = ""
+        message.registration = ""
+        message.typecode = ""
+        message.operator = ""
+        message.get_aircraft_information(aircraft_data)
+        return message
+
     def get_aircraft_information(self, aircraft_data):
         if self.hex_ident is not None:
             try:
@@ -46,5 +123,6 @@ class SBSMessage:
                 pass
 
     def get_generated_datetime(self):
-        date_time_str = f"{self.date_generated} {self.time_generated}"
-        return datetime.strptime(date_time_str, "%Y/%m/%d %H:%M:%S.%f")
\ No newline at end of file
+        if self._generated_datetime is None:
+            self._generated_datetime = parse_sbs_datetime(self.date_generated, self.time_generated)
+        return self._generated_datetime
@@ -0,0 +1,219 @@
+import bisect
+import datetime
+import math
+import time
+
+from SBSMessage import SBSMessage
+
+BEAST_ESCAPE = 0x1A
+# Beast frame type -> length of the Mode-S/Mode-AC payload. Every frame also carries a 6 byte timestamp and 1 byte
+# signal level in front of the payload.
+BEAST_PAYLOAD_LENGTHS = {0x31: 2, 0x32: 7, 0x33: 14}
+BEAST_HEADER_LENGTH = 7
+BEAST_MODE_S_LONG = 0x33
+
+DF_EXTENDED_SQUITTER = 17
+CPR_MAX = 131072  # 2^17
+CPR_PAIR_MAX_AGE_IN_SECONDS = 10
+CALLSIGN_CHARSET = "#ABCDEFGHIJKLMNOPQRSTUVWXYZ##### ###############0123456789######"
+# Latitudes at which the number of longitude zones drops from 59 to 58, ..., 2 to 1.
+NL_TRANSITION_LATITUDES = [
+    math.degrees(math.acos(math.sqrt((1 - math.cos(math.pi / 30)) / (1 - math.cos(2 * math.pi / nl)))))
+    for nl in range(59, 1, -1)
+]
+
+
+def split_frames(buffer: bytearray, view: memoryview) -> (list, int):
+    """
+    Splits Beast frames from a byte buffer. Returns the frames as (frame type, payload) and the number of consumed
+    bytes. Payloads are memoryview slices of the buffer unless they contain escaped bytes, so they are only valid as
+    long as the buffer is not modified.
+    """
+    frames = []
+    position = 0
+    size = len(buffer)
+    while True:
+        start = buffer.find(BEAST_ESCAPE, position)
+        if start < 0:
+            return frames, size
+        if start + 1 >= size:
+            return frames, start
+        payload_length = BEAST_PAYLOAD_LENGTHS.get(buffer[start + 1])
+        if payload_length is None:
+            # Not the start of a frame (e.g. an escaped byte after losing sync), search for the next one.
+            position = start + 1
+            continue
+
+        body_length = BEAST_HEADER_LENGTH + payload_length
+        end = start + 2 + body_length
+        if end > size:
+            return frames, start
+        if buffer.find(BEAST_ESCAPE, start + 2, end) < 0:
+            frames.append((buffer[start + 1], view[start + 2 + BEAST_HEADER_LENGTH:end]))
+            position = end
+            continue
+
+        body, end = unescape_frame_body(buffer, start + 2, body_length)
+        if body is None:
+            if end >= size:
+                return frames, start
+            position = end
+            continue
+        frames.append((buffer[start + 1], body[BEAST_HEADER_LENGTH:]))
+        position = end
+
+
+def unescape_frame_body(buffer: bytearray, start: int, body_length: int) -> (bytes | None, int):
+    """Copies a frame body that contains escaped 0x1A bytes. Returns None and the resync position if it is broken."""
+    body = bytearray()
+    position = start
+    size = len(buffer)
+    while len(body) < body_length:
+        if position >= size:
+            return None, size
+        value = buffer[position]
+        if value == BEAST_ESCAPE:
+            if position + 1 >= size:
+                return None, size
+            if buffer[position + 1] != BEAST_ESCAPE:
+                return None, position
+            position += 2
+        else:
+            position += 1
+        body.append(value)
+    return bytes(body), position
+
+
+def decode_altitude(altitude_field: int) -> int | None:
+    if not altitude_field & 0x10:
+        return None  # Gillham coded altitudes are not used by ADS-B transponders in practice.
+    n = ((altitude_field & 0xFE0) >> 1) | (altitude_field & 0xF)
+    return n * 25 - 1000
+
+
+def cpr_nl(latitude: float) -> int:
+    """Number of longitude zones at the given latitude, looked up instead of evaluating acos for every position."""
+    latitude = abs(latitude)
+    if latitude == 87:
+        return 2
+    return 59 - bisect.bisect_right(NL_TRANSITION_LATITUDES, latitude)
+
+
+def decode_cpr_global(even: (int, int), odd: (int, int), odd_is_newer: bool) -> tuple[float, float] | None:
+    lat_even, lon_even = even[0] / CPR_MAX, even[1] / CPR_MAX
+    lat_odd, lon_odd = odd[0] / CPR_MAX, odd[1] / CPR_MAX
+    j = math.floor(59 * lat_even - 60 * lat_odd + 0.5)
+    latitude_even = 360 / 60 * (j % 60 + lat_even)
+    latitude_odd = 360 / 59 * (j % 59 + lat_odd)
+    if latitude_even >= 270:
+        latitude_even -= 360
+    if latitude_odd >= 270:
+        latitude_odd -= 360
+    if cpr_nl(latitude_even) != cpr_nl(latitude_odd):
+        return None  # the two messages were sent in different latitude zones.
+
+    latitude = latitude_odd if odd_is_newer else latitude_even
+    nl = cpr_nl(latitude)
+    m = math.floor(lon_even * (nl - 1) - lon_odd * nl + 0.5)
+    ni = max(nl - 1, 1) if odd_is_newer else max(nl, 1)
+    longitude = 360 / ni * (m % ni + (lon_odd if odd_is_newer else lon_even))
+    if longitude >= 180:
+        longitude -= 360
+    return latitude, longitude
+
+
+def decode_cpr_local(cpr: (int, int), odd: bool, reference: (float, float)) -> (float, float):
+    """Decodes a single position relative to a reference position (e.g. the receiver) within 180 NM."""
+    lat_cpr, lon_cpr = cpr[0] / CPR_MAX, cpr[1] / CPR_MAX
+    d_lat = 360 / (59 if odd else 60)
+    j = math.floor(reference[0] / d_lat) + math.floor((reference[0] % d_lat) / d_lat - lat_cpr + 0.5)
+    latitude = d_lat * (j + lat_cpr)
+    ni = cpr_nl(latitude) - (1 if odd else 0)
+    d_lon = 360 / ni if ni > 0 else 360
+    m = math.floor(reference[1] / d_lon) + math.floor((reference[1] % d_lon) / d_lon - lon_cpr + 0.5)
+    return latitude, d_lon * (m + lon_cpr)
+
+
+class BeastDecoder:
+    """
+    Decodes DF17 extended squitter payloads from dump1090's Beast output into the same SBSMessage records that are
+    produced by the BaseStation feed (MSG 1 for identification, MSG 3 for airborne positions and MSG 4 for velocities).
+
+    dump1090 only forwards frames with a valid or corrected CRC, so the parity is not checked again.
+    """
+
+    def __init__(self, observer_position_in_degrees: (float, float), aircraft_data: dict):
+        self.observer_position = observer_position_in_degrees
+        self.aircraft_data = aircraft_data
+        # hex_ident -> [even (lat, lon, time) | None, odd (lat, lon, time) | None]
+        self.cpr_frames: dict[str, list] = {}
+
+    def decode(self, payload, generated: datetime.datetime, now: float | None = None) -> SBSMessage | None:
+        if payload[0] >> 3 != DF_EXTENDED_SQUITTER:
+            return None
+        hex_ident = payload[1:4].hex().upper()
+        me = int.from_bytes(payload[4:11], "big")
+        typecode = me >> 51
+        if 1 <= typecode <= 4:
+            return self.decode_identification(hex_ident, me, generated)
+        if 9 <= typecode <= 18:
+            return self.decode_airborne_position(hex_ident, me, generated, time.monotonic() if now is None else now)
+        if typecode == 19:
+            return self.decode_velocity(hex_ident, me, generated)
+        return None
+
+    def decode_identification(self, hex_ident: str, me: int, generated: datetime.datetime) -> SBSMessage:
+        callsign = "".join(CALLSIGN_CHARSET[(me >> (42 - 6 * i)) & 0x3F] for i in range(8))
+        return SBSMessage.from_values(self.aircraft_data, "1", hex_ident, generated,
+                                      callsign=callsign.replace("#", "").replace(" ", ""))
+
+    def decode_airborne_position(self, hex_ident: str, me: int, generated: datetime.datetime,
+                                 now: float) -> SBSMessage | None:
+        altitude = decode_altitude((me >> 36) & 0xFFF)
+        if altitude is None:
+            return None
+        odd = (me >> 34) & 1
+        cpr = ((me >> 17) & 0x1FFFF, me & 0x1FFFF)
+
+        frames = self.cpr_frames.setdefault(hex_ident, [None, None])
+        frames[odd] = (cpr[0], cpr[1], now)
+        other = frames[1 - odd]
+        position = None
+        if other is not None and now - other[2] <= CPR_PAIR_MAX_AGE_IN_SECONDS:
+            even_frame, odd_frame = (other, frames[1]) if odd else (frames[0], other)
+            position = decode_cpr_global(even_frame[:2], odd_frame[:2], bool(odd))
+        if position is None:
+            position = decode_cpr_local(cpr, bool(odd), self.observer_position)
+
+        return SBSMessage.from_values(self.aircraft_data, "3", hex_ident, generated,
+                                      altitude=str(altitude),
+                                      latitude=f"{position[0]:.5f}",
+                                      longitude=f"{position[1]:.5f}")
+
+    def decode_velocity(self, hex_ident: str, me: int, generated: datetime.datetime) -> SBSMessage | None:
+        subtype = (me >> 48) & 0x7
+        if subtype not in (1, 2):
+            return None  # airspeed subtypes carry heading instead of track.
+        v_ew = (me >> 32) & 0x3FF
+        v_ns = (me >> 21) & 0x3FF
+        if v_ew == 0 or v_ns == 0:
+            return None
+        factor = 4 if subtype == 2 else 1
+        v_east = (v_ew - 1) * factor * (-1 if (me >> 42) & 1 else 1)
+        v_north = (v_ns - 1) * factor * (-1 if (me >> 31) & 1 else 1)
+        vertical_rate_field = (me >> 10) & 0x1FF
+        vertical_rate = ""
+        if vertical_rate_field != 0:
+            vertical_rate = str((vertical_rate_field - 1) * 64 * (-1 if (me >> 19) & 1 else 1))
+
+        return SBSMessage.from_values(self.aircraft_data, "4", hex_ident, generated,
+                                      ground_speed=str(round(math.hypot(v_east, v_north))),
+                                      track=f"{math.degrees(math.atan2(v_east, v_north)) % 360:.1f}",
+                                      vertical_rate=vertical_rate)
+
+    def prune(self, now: float | None = None):
+        """Drops position frames that are too old to be paired anymore."""
+        now = time.monotonic() if now is None else now
+        for hex_ident in [h for h, frames in self.cpr_frames.items()
+                          if all(f is None or now - f[2] > CPR_PAIR_MAX_AGE_IN_SECONDS for f in frames)]:
+            del self.cpr_frames[hex_ident]
@@ -0,0 +1,79 @@
+import argparse
+import datetime
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from peewee import SqliteDatabase
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_PORT", "3306")
+
+import planedata_processor as processor  # noqa: E402
+from SBSMessage import SBSMessage  # noqa: E402
+from database_models import Callsigns  # noqa: E402
+from db_spool import DatabaseSpool  # noqa: E402
+
+
+class CountingDatabase(SqliteDatabase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = 0
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        self.statements += 1
+        return super().execute_sql(sql, params, *args, **kwargs)
+
+
+def create_messages(num_messages: int, num_aircraft: int) -> list[SBSMessage]:
+    aircraft_data = {f"{i:06X}": {"registration": "D-AIZA", "typecode": "A320", "operator": "Lufthansa"}
+                     for i in range(num_aircraft)}
+    now = datetime.datetime.now()
+    return [SBSMessage.from_values(aircraft_data, "1", f"{i % num_aircraft:06X}", now,
+                                   callsign=f"DLH{i % num_aircraft}") for i in range(num_messages)]
+
+
+def run(name: str, messages: list[SBSMessage], flush_interval: int, directory: str):
+    """
+    Handles the identification messages with the processor and flushes the counters every flush_interval messages,
+    on a fresh SQLite stand-in. Runs in its own process, so the runs do not share any processor state.
+    """
+    database = CountingDatabase(os.path.join(directory, f"{flush_interval}.sqlite"), pragmas={"journal_mode": "wal"})
+    with database.bind_ctx([Callsigns]):
+        database.create_tables([Callsigns])
+        processor.database_spool = DatabaseSpool(os.path.join(directory, f"{flush_interval}_spool.sqlite"))
+        database.statements = 0
+        start = time.perf_counter()
+        for i, message in enumerate(messages):
+            processor.handle_transmission_type_1(message)
+            if (i + 1) % flush_interval == 0:
+                processor.flush_callsign_counters()
+        processor.flush_callsign_counters()
+        duration = time.perf_counter() - start
+        statements = database.statements
+        written = sum(callsign.num_messages for callsign in Callsigns.select(Callsigns.num_messages))
+    print(f"{name:19s}  {duration * 1e6 / len(messages):10.1f}  {statements:10d}  {written:20d}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares writing the callsign counters per message with writing "
+                                                 "them in bulk (on SQLite).")
+    parser.add_argument("-n", "--messages", type=int, default=100000, help="Identification messages (default: 100000).")
+    parser.add_argument("-a", "--aircraft", type=int, default=processor.CALLSIGNS_LIST_MAX_LEN,
+                        help=f"Tracked planes, more than the callsigns kept in memory are added again "
+                             f"(default: {processor.CALLSIGNS_LIST_MAX_LEN}).")
+    parser.add_argument("-f", "--flush-interval", type=int, default=10000,
+                        help="Messages between two bulk writes, e.g. 30 s of messages (default: 10000).")
+    args = parser.parse_args()
+
+    messages = create_messages(args.messages, args.aircraft)
+    directory = tempfile.mkdtemp()
+    print("method               us/message  statements  num_messages written")
+    for name, flush_interval in [("written per message", 1), ("bulk counters", args.flush_interval)]:
+        process = multiprocessing.get_context("fork").Process(target=run, args=(name, messages, flush_interval,
+                                                                                directory))
+        process.start()
+        process.join()
@@ -0,0 +1,98 @@
+import argparse
+import importlib.util
+import inspect
+import math
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPOSITORY_PATH = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPOSITORY_PATH))
+
+import cpa_predictor  # noqa: E402
+
+OBSERVER_POSITION = (math.radians(50.036), math.radians(8.553))
+APPROACHING_LIST_MAX_LEN = 3
+PREDICTION_INTERVAL_IN_SECONDS = 1
+
+
+def load_revision(revision: str, directory: Path):
+    """Loads cpa_predictor.py of a git revision, e.g. the one before a change."""
+    source = subprocess.run(["git", "show", f"{revision}:cpa_predictor.py"], cwd=REPOSITORY_PATH, capture_output=True,
+                            check=True).stdout
+    path = directory.joinpath("cpa_predictor_revision.py")
+    path.write_bytes(source)
+    spec = importlib.util.spec_from_file_location("cpa_predictor_revision", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_predictor(module, num_aircraft: int, now: float):
+    """Planes within 250 km around the observer, most of them with a known velocity."""
+    predictor = module.CPAPredictor(OBSERVER_POSITION)
+    for i in range(num_aircraft):
+        hex_ident = f"{i:06X}"
+        position = (OBSERVER_POSITION[0] + math.radians(random.uniform(-2.2, 2.2)),
+                    OBSERVER_POSITION[1] + math.radians(random.uniform(-3.5, 3.5)))
+        predictor.update_position(hex_ident, position, random.randrange(1000, 40000, 25),
+                                  now - random.uniform(0, 10))
+        if random.random() < 0.9:
+            predictor.update_velocity(hex_ident, random.uniform(120, 500), random.uniform(0, 360),
+                                      random.uniform(-2000, 2000))
+    return predictor
+
+
+def predict_approaching(predictor, now: float) -> list:
+    """The approaching planes as shown by the processor, older revisions return all planes."""
+    if "limit" in inspect.signature(predictor.predict).parameters:
+        return predictor.predict(now, APPROACHING_LIST_MAX_LEN)
+    return [a for a in predictor.predict(now) if a.time_to_closest > 0][:APPROACHING_LIST_MAX_LEN]
+
+
+def measure_tick(module, num_aircraft: int, repeat: int) -> float:
+    """Returns the time of a prediction tick in us."""
+    now = time.monotonic()
+    predictor = create_predictor(module, num_aircraft, now)
+    start = time.perf_counter()
+    for i in range(repeat):
+        predict_approaching(predictor, now + i * PREDICTION_INTERVAL_IN_SECONDS)
+    return (time.perf_counter() - start) * 1e6 / repeat
+
+
+def measure_updates(module, num_messages: int) -> float:
+    """Returns the time of a position and a velocity update in us."""
+    predictor = module.CPAPredictor(OBSERVER_POSITION)
+    messages = [(f"{random.randrange(300):06X}", (OBSERVER_POSITION[0] + math.radians(random.uniform(-2, 2)),
+                                                  OBSERVER_POSITION[1] + math.radians(random.uniform(-3, 3))))
+                for _ in range(num_messages)]
+    start = time.perf_counter()
+    for hex_ident, position in messages:
+        predictor.update_position(hex_ident, position, 10000)
+        predictor.update_velocity(hex_ident, 300, 90, 0)
+    return (time.perf_counter() - start) * 1e6 / num_messages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the closest point of approach prediction per tick by number "
+                                                 "of aircraft.")
+    parser.add_argument("-r", "--revision", help="Also measure cpa_predictor.py of a git revision.")
+    parser.add_argument("-a", "--aircraft", type=int, nargs="+", default=[50, 100, 200, 500, 1000, 2000],
+                        help="Numbers of tracked aircraft (default: 50 100 200 500 1000 2000).")
+    parser.add_argument("-n", "--repeat", type=int, default=200, help="Ticks per measurement (default: 200).")
+    args = parser.parse_args()
+
+    modules = [("working tree", cpa_predictor)]
+    with tempfile.TemporaryDirectory() as directory:
+        if args.revision:
+            modules.insert(0, (args.revision, load_revision(args.revision, Path(directory))))
+        for name, module in modules:
+            random.seed(1)
+            print(f"{name}: position and velocity update {measure_updates(module, 20000):.1f} us")
+            print("  aircraft  us/tick  CPU share at one tick per second")
+            for num_aircraft in args.aircraft:
+                tick = measure_tick(module, num_aircraft, args.repeat)
+                print(f"  {num_aircraft:8d}  {tick:7.0f}  {tick / 1e6 / PREDICTION_INTERVAL_IN_SECONDS:.2%}")
@@ -0,0 +1,142 @@
+import argparse
+import datetime
+import math
+import random
+import socket
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from beast_decoder import (BEAST_ESCAPE, BEAST_MODE_S_LONG, CALLSIGN_CHARSET, CPR_MAX, BeastDecoder,  # noqa: E402
+                           cpr_nl, split_frames)
+from feed_reader import BeastFeedReader, SBSFeedReader  # noqa: E402
+
+OBSERVER_POSITION = (50.036, 8.553)
+
+
+def encode_cpr(latitude: float, longitude: float, odd: bool) -> (int, int):
+    d_lat = 360 / (59 if odd else 60)
+    lat_cpr = math.floor(CPR_MAX * (latitude % d_lat) / d_lat + 0.5)
+    ni = cpr_nl(d_lat * (lat_cpr / CPR_MAX + math.floor(latitude / d_lat))) - (1 if odd else 0)
+    d_lon = 360 / ni if ni > 0 else 360
+    lon_cpr = math.floor(CPR_MAX * (longitude % d_lon) / d_lon + 0.5)
+    return lat_cpr % CPR_MAX, lon_cpr % CPR_MAX
+
+
+def encode_beast_frame(icao: int, me: int) -> bytes:
+    payload = bytes([17 << 3 | 5]) + icao.to_bytes(3, "big") + me.to_bytes(7, "big") + bytes(3)
+    body = bytes(6) + bytes([0x80]) + payload
+    return bytes([BEAST_ESCAPE, BEAST_MODE_S_LONG]) + body.replace(b"\x1a", b"\x1a\x1a")
+
+
+def encode_identification(callsign: str) -> int:
+    me = 4 << 51
+    for i, char in enumerate(callsign.ljust(8)):
+        me |= CALLSIGN_CHARSET.index(char) << (42 - 6 * i)
+    return me
+
+
+def encode_position(latitude: float, longitude: float, altitude: int, odd: bool) -> int:
+    n = (altitude + 1000) // 25
+    altitude_field = ((n >> 4) << 5) | 0x10 | (n & 0xF)
+    lat_cpr, lon_cpr = encode_cpr(latitude, longitude, odd)
+    return 11 << 51 | altitude_field << 36 | int(odd) << 34 | lat_cpr << 17 | lon_cpr
+
+
+def encode_velocity(ground_speed: float, track: float, vertical_rate: int) -> int:
+    v_east = round(ground_speed * math.sin(math.radians(track)))
+    v_north = round(ground_speed * math.cos(math.radians(track)))
+    vr_field = abs(vertical_rate) // 64 + 1
+    return (19 << 51 | 1 << 48 | int(v_east < 0) << 42 | (abs(v_east) + 1) << 32 | int(v_north < 0) << 31
+            | (abs(v_north) + 1) << 21 | int(vertical_rate < 0) << 19 | vr_field << 10)
+
+
+def create_synthetic_capture(num_aircraft: int, duration_in_seconds: int) -> bytes:
+    """Creates Beast traffic similar to dump1090: two positions, one velocity and a few identifications per second."""
+    random.seed(1)
+    frames = []
+    aircraft = [(0x3C0000 + i, f"DLH{i:04d}", OBSERVER_POSITION[0] + random.uniform(-1.5, 1.5),
+                 OBSERVER_POSITION[1] + random.uniform(-2, 2), random.randrange(2000, 40000, 25),
+                 random.uniform(150, 480), random.uniform(0, 360)) for i in range(num_aircraft)]
+    for second in range(duration_in_seconds):
+        for icao, callsign, latitude, longitude, altitude, speed, track in aircraft:
+            distance = speed * 1.852 / 3600 * second
+            latitude += distance / 111.2 * math.cos(math.radians(track))
+            longitude += distance / (111.2 * math.cos(math.radians(latitude))) * math.sin(math.radians(track))
+            if second % 5 == 0:
+                frames.append(encode_beast_frame(icao, encode_identification(callsign)))
+            frames.append(encode_beast_frame(icao, encode_position(latitude, longitude, altitude, False)))
+            frames.append(encode_beast_frame(icao, encode_position(latitude, longitude, altitude, True)))
+            frames.append(encode_beast_frame(icao, encode_velocity(speed, track, 0)))
+    return b"".join(frames)
+
+
+def format_sbs_line(message) -> str:
+    return ",".join(["MSG", message.transmission_type, "1", "1", message.hex_ident, "1",
+                     message.date_generated, message.time_generated, message.date_logged, message.time_logged,
+                     message.callsign, message.altitude, message.ground_speed, message.track, message.latitude,
+                     message.longitude, message.vertical_rate, "", "", "", "", "0"])
+
+
+def convert_to_sbs(capture: bytes) -> bytes:
+    """Creates the BaseStation text dump1090 would have sent for the decodable messages of the capture."""
+    buffer = bytearray(capture)
+    decoder = BeastDecoder(OBSERVER_POSITION, {})
+    generated = datetime.datetime.now()
+    lines = []
+    with memoryview(buffer) as view:
+        frames, _ = split_frames(buffer, view)
+        for frame_type, payload in frames:
+            message = decoder.decode(payload, generated, 0) if frame_type == BEAST_MODE_S_LONG else None
+            if message is not None:
+                lines.append(format_sbs_line(message))
+            if isinstance(payload, memoryview):
+                payload.release()
+    return ("\r\n".join(lines) + "\r\n").encode()
+
+
+def serve_feed(server: socket.socket, data: bytes):
+    connection, _ = server.accept()
+    with connection:
+        connection.sendall(data)
+
+
+def measure_feed(name: str, data: bytes, create_reader):
+    """Replays the data through a local stand-in feed and measures the CPU time of the reading thread."""
+    with socket.create_server(("127.0.0.1", 0)) as server:
+        threading.Thread(target=serve_feed, args=(server, data), daemon=True).start()
+        with socket.create_connection(server.getsockname()) as connection:
+            connection.settimeout(1)
+            reader = create_reader(connection)
+            num_messages = 0
+            start = time.thread_time()
+            while True:
+                messages = reader.read_messages()
+                if messages is None:
+                    break
+                num_messages += len(messages)
+            cpu_time = time.thread_time() - start
+
+    print(f"{name:6s} {num_messages:8d} messages {len(data):10d} bytes {len(data) / max(num_messages, 1):6.1f} "
+          f"bytes/message {cpu_time * 1e6 / max(num_messages, 1):6.1f} us CPU/message")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the SBS and the Beast feed on the same traffic.")
+    parser.add_argument("-f", "--file", help="Recorded Beast capture (e.g. 'nc localhost 30005 > capture.bin').")
+    parser.add_argument("-a", "--aircraft", type=int, default=100, help="Synthetic aircraft (default: 100).")
+    parser.add_argument("-d", "--duration", type=int, default=60, help="Synthetic duration in s (default: 60).")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "rb") as f:
+            beast_capture = f.read()
+    else:
+        beast_capture = create_synthetic_capture(args.aircraft, args.duration)
+    sbs_capture = convert_to_sbs(beast_capture)
+
+    measure_feed("sbs", sbs_capture, lambda connection: SBSFeedReader(connection, {}))
+    measure_feed("beast", beast_capture, lambda connection: BeastFeedReader(connection, {}, OBSERVER_POSITION))
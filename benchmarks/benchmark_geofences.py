@@ -0,0 +1,80 @@
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from geofences import SpatialIndex, Zone, is_in_zone  # noqa: E402
+
+# Zones and planes are spread over the range of a receiver (about 300 x 400 km).
+AREA = (48.7, 6.5, 51.4, 10.5)
+
+
+def create_zones(num_zones: int) -> list[Zone]:
+    zones = []
+    for i in range(num_zones):
+        latitude, longitude = random.uniform(AREA[0], AREA[2]), random.uniform(AREA[1], AREA[3])
+        if i % 2:
+            zones.append(Zone(f"radius{i}", [(latitude, longitude)], random.uniform(2, 10)))
+        else:
+            size = random.uniform(0.02, 0.1)
+            points = [(latitude, longitude), (latitude + size, longitude + size / 3),
+                      (latitude + size, longitude + size), (latitude, longitude + size)]
+            zones.append(Zone(f"polygon{i}", points, None))
+    return zones
+
+
+def create_updates(num_aircraft: int, num_updates: int) -> list[tuple[str, float, float]]:
+    """Planes flying straight at 450 kt with a position every 0.5 s."""
+    step = 450 * 1.852 / 3600 * 0.5 / 111.2
+    planes = [[f"{i:06X}", random.uniform(AREA[0], AREA[2]), random.uniform(AREA[1], AREA[3]),
+               random.uniform(0, 2 * math.pi)] for i in range(num_aircraft)]
+    updates = []
+    for i in range(num_updates):
+        plane = planes[i % num_aircraft]
+        plane[1] += step * math.cos(plane[3])
+        plane[2] += step * math.sin(plane[3]) / math.cos(math.radians(plane[1]))
+        updates.append((plane[0], plane[1], plane[2]))
+    return updates
+
+
+def run_index(zones: list[Zone], updates: list) -> (float, int):
+    index = SpatialIndex(zones)
+    events = 0
+    start = time.perf_counter()
+    for hex_ident, latitude, longitude in updates:
+        events += len(index.update(hex_ident, latitude, longitude, 5000))
+    return time.perf_counter() - start, events
+
+
+def run_scan(zones: list[Zone], updates: list) -> (float, int):
+    """Tests every zone for every position."""
+    memberships: dict[str, set[int]] = {}
+    events = 0
+    start = time.perf_counter()
+    for hex_ident, latitude, longitude in updates:
+        inside = {i for i, zone in enumerate(zones) if is_in_zone(zone, latitude, longitude)}
+        events += len(inside ^ memberships.get(hex_ident, set()))
+        memberships[hex_ident] = inside
+    return time.perf_counter() - start, events
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the cost of geofence updates by number of zones and planes.")
+    parser.add_argument("-n", "--updates", type=int, default=50000, help="Position updates (default: 50000).")
+    args = parser.parse_args()
+
+    random.seed(1)
+    print("zones  aircraft  index (us/update)  scan (us/update)  events")
+    for num_zones in [1, 10, 100, 1000]:
+        zones = create_zones(num_zones)
+        for num_aircraft in [100, 1000]:
+            updates = create_updates(num_aircraft, args.updates)
+            index_time, index_events = run_index(zones, updates)
+            scan_time, scan_events = run_scan(zones, updates)
+            assert index_events == scan_events
+            print(f"{num_zones:5d}  {num_aircraft:8d}  {index_time * 1e6 / len(updates):17.1f}  "
+                  f"{scan_time * 1e6 / len(updates):16.1f}  {index_events:6d}")
@@ -0,0 +1,67 @@
+import argparse
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+from io import BytesIO
+from pathlib import Path
+
+REPOSITORY_PATH = Path(__file__).resolve().parent.parent
+
+
+def measure_import(directory: Path, module: str) -> (int, list[tuple[int, str]]):
+    """
+    Imports the module in a fresh interpreter with -X importtime. Returns the total time and the cumulative time of
+    every module imported directly by the module in us.
+    """
+    environment = dict(os.environ)
+    environment.setdefault("DATABASE_PORT", "3306")  # read at import time, normally set in the .env file.
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=directory,
+                            env=environment, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr.splitlines()[-1]}")
+
+    # Nested imports are indented by two spaces per level and reported before the module importing them.
+    direct_imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 0:
+            if name.strip() == module:
+                return int(cumulative), direct_imports
+            direct_imports = []
+        elif depth == 1:
+            direct_imports.append((int(cumulative), name.strip()))
+    raise RuntimeError(f"{module} not found in the import times.")
+
+
+def export_revision(revision: str, directory: Path):
+    archive = subprocess.run(["git", "archive", revision], cwd=REPOSITORY_PATH, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=BytesIO(archive)) as tar:
+        tar.extractall(directory, filter="data")
+
+
+def report(name: str, directory: Path, module: str, repeat: int, top: int):
+    # The fastest run is used, the first one also compiles the modules.
+    total, direct_imports = min((measure_import(directory, module) for _ in range(repeat)), key=lambda run: run[0])
+    print(f"{name}: import {module} takes {total / 1000:.1f} ms")
+    for cumulative, imported in sorted(direct_imports, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:8.1f} ms  {imported}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the import time of the data processor with -X importtime.")
+    parser.add_argument("-r", "--revision", help="Also measure a git revision, e.g. the one before a change.")
+    parser.add_argument("-m", "--module", default="planedata_processor", help="Module to import.")
+    parser.add_argument("-n", "--repeat", type=int, default=5, help="Number of runs (default: 5).")
+    parser.add_argument("-t", "--top", type=int, default=10, help="Number of direct imports shown (default: 10).")
+    args = parser.parse_args()
+
+    if args.revision:
+        with tempfile.TemporaryDirectory() as revision_directory:
+            export_revision(args.revision, Path(revision_directory))
+            report(args.revision, Path(revision_directory), args.module, args.repeat, args.top)
+    report("working tree", REPOSITORY_PATH, args.module, args.repeat, args.top)
@@ -0,0 +1,112 @@
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from peewee import SQL, SqliteDatabase
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_PORT", "3306")
+
+# Runs headless, the GPIO and screen are not set up.
+import planedata_processor as processor  # noqa: E402
+from SBSMessage import SBSMessage  # noqa: E402
+from benchmark_feeds import convert_to_sbs, create_synthetic_capture  # noqa: E402
+from cpa_predictor import CPAPredictor  # noqa: E402
+from database_models import Callsigns, GeofenceEvents, Positions  # noqa: E402
+from db_spool import DatabaseSpool  # noqa: E402
+from ring_buffer import SharedRingBuffer  # noqa: E402
+
+BATCH_SIZE = 64  # about the number of messages returned by one read of the feed.
+MODELS = [Callsigns, Positions, GeofenceEvents]
+
+
+def read_batches(lines: list[str]) -> list[list[str]]:
+    lines = [line.strip() for line in lines if line.strip()]
+    return [lines[i:i + BATCH_SIZE] for i in range(0, len(lines), BATCH_SIZE)]
+
+
+def create_tables(database: SqliteDatabase):
+    """Creates the tables on the SQLite stand-in with the defaults of setup/database_init.sql the processor needs."""
+    for field in [Callsigns.first_message_received, Positions.message_received, GeofenceEvents.message_received]:
+        field.constraints = [SQL("DEFAULT CURRENT_TIMESTAMP")]
+    database.create_tables(MODELS)
+
+
+def run_single_process(batches: list[list[str]], aircraft_data: dict, broadcast: bool):
+    for batch in batches:
+        messages = [SBSMessage(line, aircraft_data) for line in batch]
+        processor.process_messages_in_single_process(0, False, broadcast, messages)
+    processor.flush_all_positions()
+    processor.flush_callsign_counters()
+
+
+def run_multi_process(batches: list[list[str]], aircraft_data: dict, broadcast: bool):
+    feed_ring = SharedRingBuffer(processor.FEED_RECORD, processor.FEED_RING_CAPACITY)
+    snapshot_ring = SharedRingBuffer(processor.snapshot_record, processor.SNAPSHOT_RING_CAPACITY)
+    stop_event = multiprocessing.get_context("fork").Event()
+    workers = processor.start_workers(feed_ring, snapshot_ring, aircraft_data, 0, False, broadcast, stop_event)
+    for batch in batches:
+        processor.write_feed_records(feed_ring, [SBSMessage(line, aircraft_data) for line in batch])
+    # Waits until the workers have drained the ring buffer.
+    processor.stop_workers(workers, stop_event)
+    feed_ring.close()
+    snapshot_ring.close()
+
+
+def run_mode(mode: str, batches: list[list[str]], aircraft_data: dict, broadcast: bool, directory: str):
+    """Runs a mode in its own process on a fresh SQLite stand-in, so the modes do not share any processor state."""
+    database = SqliteDatabase(os.path.join(directory, f"{mode}.sqlite"), pragmas={"journal_mode": "wal"})
+    with database.bind_ctx(MODELS):
+        create_tables(database)
+        database.close()  # the forked workers open their own connection.
+        processor.DATABASE_SPOOL_PATH = os.path.join(directory, f"{mode}_spool.sqlite")
+        processor.init_tracking()
+        processor.cpa_predictor = CPAPredictor(processor.get_observer_location_in_degrees())
+        num_messages = sum(len(batch) for batch in batches)
+
+        start_wall, start_cpu = time.monotonic(), time.process_time()
+        if mode == "single":
+            processor.database_spool = DatabaseSpool(processor.DATABASE_SPOOL_PATH)
+            run_single_process(batches, aircraft_data, broadcast)
+        else:
+            run_multi_process(batches, aircraft_data, broadcast)
+        wall, cpu = time.monotonic() - start_wall, time.process_time() - start_cpu
+        workers_cpu = resource.getrusage(resource.RUSAGE_CHILDREN)
+        workers_cpu = workers_cpu.ru_utime + workers_cpu.ru_stime
+        rows = {model._meta.table_name: model.select().count() for model in MODELS}
+
+    print(f"{mode}: {num_messages} messages in {wall:.1f} s ({num_messages / wall:.0f} messages/s), main process "
+          f"{cpu:.1f} s CPU ({cpu / wall:.0%} of one core), workers {workers_cpu:.1f} s CPU "
+          f"({workers_cpu / wall:.0%} of one core), {multiprocessing.cpu_count()} cores, written {rows}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the single-process loop with the multi-process mode on the "
+                                                 "same capture (on SQLite).")
+    parser.add_argument("file", nargs="?", help="Recorded SBS capture (e.g. 'nc localhost 30003 > capture.txt'). "
+                                                "Synthetic traffic of benchmark_feeds.py if not set.")
+    parser.add_argument("-m", "--mode", choices=["single", "multi"], nargs="+", default=["single", "multi"])
+    parser.add_argument("-a", "--aircraft", type=int, default=200, help="Synthetic aircraft (default: 200).")
+    parser.add_argument("-d", "--duration", type=int, default=60, help="Synthetic duration in s (default: 60).")
+    parser.add_argument("-b", "--broadcast", action="store_true", help="Also broadcast to the planeradar_server.")
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, "r") as f:
+            batches = read_batches(f.readlines())
+    else:
+        batches = read_batches(convert_to_sbs(create_synthetic_capture(args.aircraft, args.duration)).decode()
+                               .splitlines())
+    aircraft_data = processor.get_aircraft_data(False) if os.path.exists("aircraftDatabase.csv") else {}
+
+    directory = tempfile.mkdtemp()
+    for mode in args.mode:
+        process = multiprocessing.get_context("fork").Process(target=run_mode, args=(
+            mode, batches, aircraft_data, args.broadcast, directory))
+        process.start()
+        process.join()
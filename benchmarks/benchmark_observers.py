@@ -0,0 +1,74 @@
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from observers import R0, Observer, create_observer_tracker  # noqa: E402
+
+BATCH_SIZE = 64  # about the number of messages returned by one read of the feed.
+PREF_ALT_LIMIT_IN_FEET = 15000
+HIGH_ALT_DIST_PENALTY_IN_KM = 20
+
+
+def create_observers(num_observers: int) -> list[Observer]:
+    return [Observer(f"observer{i}", math.radians(50.036 + random.uniform(-0.3, 0.3)),
+                     math.radians(8.553 + random.uniform(-0.5, 0.5))) for i in range(num_observers)]
+
+
+def create_positions(num_messages: int) -> list[tuple[str, float, float, int]]:
+    return [(f"{random.randrange(200):06X}", 50.036 + random.uniform(-1.5, 1.5), 8.553 + random.uniform(-2, 2),
+             random.randrange(1000, 40000, 25)) for _ in range(num_messages)]
+
+
+def run_tracker(observers: list[Observer], positions: list) -> float:
+    """The tracker used by the data processor, vectorized for several observers and scalar for a single one."""
+    tracker = create_observer_tracker(observers, PREF_ALT_LIMIT_IN_FEET, HIGH_ALT_DIST_PENALTY_IN_KM)
+    start = time.perf_counter()
+    for i in range(0, len(positions), BATCH_SIZE):
+        batch = positions[i:i + BATCH_SIZE]
+        distances, bearings = tracker.measure([latitude for _, latitude, _, _ in batch],
+                                              [longitude for _, _, longitude, _ in batch])
+        for row, (hex_ident, _, _, altitude) in enumerate(batch):
+            closer = tracker.find_closer(hex_ident, distances[row], altitude)
+            if closer is not None:
+                tracker.update(closer, hex_ident, hex_ident, distances[row], bearings[row], altitude)
+    return time.perf_counter() - start
+
+
+def run_per_observer(observers: list[Observer], positions: list) -> float:
+    """The calculation of the single observer version, repeated for every observer."""
+    closest = [[None, math.inf, None, math.inf] for _ in observers]
+    start = time.perf_counter()
+    for hex_ident, latitude, longitude, altitude in positions:
+        plane_latitude, plane_longitude = math.radians(latitude), math.radians(longitude)
+        for observer, slots in zip(observers, closest):
+            f0 = math.cos(observer.latitude)
+            distance = round(R0 * math.sqrt((plane_latitude - observer.latitude) ** 2 + f0 ** 2 * (
+                    plane_longitude - observer.longitude) ** 2), 2)
+            adjusted = distance if altitude < PREF_ALT_LIMIT_IN_FEET else distance + HIGH_ALT_DIST_PENALTY_IN_KM
+            if slots[0] == hex_ident or distance < slots[1]:
+                slots[0], slots[1] = hex_ident, distance
+            if slots[2] == hex_ident or adjusted < slots[3]:
+                slots[2], slots[3] = hex_ident, adjusted
+            if slots[0] == hex_ident or slots[2] == hex_ident:
+                math.atan2((plane_longitude - observer.longitude) * f0, plane_latitude - observer.latitude)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the cost per position message by number of observers.")
+    parser.add_argument("-n", "--messages", type=int, default=20000, help="Position messages (default: 20000).")
+    args = parser.parse_args()
+
+    random.seed(1)
+    positions = create_positions(args.messages)
+    print("observers     tracker  per observer (us/message)")
+    for num_observers in [1, 2, 4, 8, 16, 32, 64, 128]:
+        observers = create_observers(num_observers)
+        tracker = run_tracker(observers, positions) * 1e6 / len(positions)
+        per_observer = run_per_observer(observers, positions) * 1e6 / len(positions)
+        print(f"{num_observers:9d}  {tracker:10.1f}  {per_observer:12.1f}")
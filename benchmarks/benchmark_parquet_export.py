@@ -0,0 +1,138 @@
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from peewee import SqliteDatabase
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_PORT", "3306")
+
+import data_analysis  # noqa: E402
+import parquet_export  # noqa: E402
+from database_models import Callsigns, Positions  # noqa: E402
+
+TYPECODES = ["A320", "A20N", "A321", "A21N", "B738", "B38M", "A319", "B77W", "A359", "E190", "CRJ9", "A333", "B789",
+             "AT76", "DH8D", "B744", "A388", "C172", "PC12", "GLF6", ""] + [f"T{i:03d}" for i in range(300)]
+OPERATORS = ["Lufthansa", "Condor", "Ryanair", "easyJet", "TUIfly", "Eurowings", "United", "Emirates", ""] + [
+    f"Operator {i}" for i in range(500)]
+# A few types and operators are far more frequent than the others.
+TYPE_WEIGHTS = [1 / (rank + 1) for rank in range(len(TYPECODES))]
+OPERATOR_WEIGHTS = [1 / (rank + 1) for rank in range(len(OPERATORS))]
+
+
+def create_rows(num_callsigns: int, positions_per_callsign: int, first_id: int, total: int) -> (list[dict], list[dict]):
+    """Planes seen in the 120 days around the analyzed period, with a few positions each."""
+    start = datetime.datetime(2025, 2, 1)
+    callsigns, positions = [], []
+    for i in range(first_id, first_id + num_callsigns):
+        first = start + datetime.timedelta(seconds=i * 120 * 86400 // total)
+        last = first + datetime.timedelta(minutes=random.randrange(2, 30))
+        callsigns.append({
+            "id": i, "hex_ident": f"{random.randrange(1 << 24):06X}", "callsign": f"DLH{random.randrange(5000)}",
+            "first_message_generated": first, "first_message_received": first, "last_message_generated": last,
+            "last_message_received": last, "registration": f"D-A{i % 17576:04d}",
+            "typecode": random.choices(TYPECODES, TYPE_WEIGHTS)[0] if random.random() > 0.05 else None,
+            "operator": random.choices(OPERATORS, OPERATOR_WEIGHTS)[0] if random.random() > 0.05 else None,
+            "num_messages": random.randrange(10, 3000), "closest_dist": random.uniform(0, 200),
+            "lowest_alt": random.randrange(0, 40000)})
+        for j in range(positions_per_callsign):
+            received = first + (last - first) * j / max(1, positions_per_callsign - 1)
+            positions.append({
+                "id": i * positions_per_callsign + j, "hex_ident": callsigns[-1]["hex_ident"], "callsign_id": i,
+                "latitude": random.uniform(48.7, 51.4), "longitude": random.uniform(6.5, 10.5),
+                "altitude": random.randrange(0, 40000), "distance": random.uniform(0, 200),
+                "bearing": random.uniform(0, 6.28), "message_generated": received, "message_received": received,
+                "num_message": j})
+    return callsigns, positions
+
+
+def insert_rows(database: SqliteDatabase, callsigns: list[dict], positions: list[dict]):
+    with database.atomic():
+        for model, rows in [(Callsigns, callsigns), (Positions, positions)]:
+            for i in range(0, len(rows), 5000):
+                model.insert_many(rows[i:i + 5000]).execute()
+
+
+def query_sqlite(path: str):
+    """The SQL queries of data_analysis.py, run against SQLite."""
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    period = (data_analysis.END_DATE, data_analysis.START_DATE)
+    cursor.execute("""
+        SELECT typecode, COUNT(*) as count FROM callsigns
+        WHERE typecode is not NULL AND typecode != '' AND first_message_received < ? AND first_message_received > ?
+        GROUP BY typecode ORDER BY count DESC LIMIT ?""", period + (data_analysis.TOP_LIST_LEN,))
+    top_types_list = [row[0] for row in cursor.fetchall()]
+    placeholders = ",".join("?" * len(top_types_list))
+    cursor.execute(f"""
+        SELECT typecode, COUNT(*) as count FROM callsigns
+        WHERE typecode IN ({placeholders}) AND first_message_received < ? AND first_message_received > ?
+        GROUP BY typecode ORDER BY count""", top_types_list + list(period))
+    top_types_counts = cursor.fetchall()
+    cursor.execute(f"""
+        SELECT COUNT(*) as count FROM callsigns
+        WHERE typecode NOT IN ({placeholders}) AND first_message_received < ? AND first_message_received > ?""",
+                   top_types_list + list(period))
+    misc_count = cursor.fetchone()[0]
+    cursor.execute(f"""
+        SELECT typecode, COUNT(*) as count FROM callsigns
+        WHERE typecode NOT IN ({placeholders}) AND first_message_received < ? AND first_message_received > ?
+        GROUP BY typecode ORDER BY count DESC""", top_types_list + list(period))
+    misc_types_counts = cursor.fetchall()
+    cursor.execute("""
+        SELECT operator, COUNT(*) as count FROM callsigns
+        WHERE first_message_received < ? AND first_message_received > ? and operator != ''
+        GROUP BY operator ORDER BY count DESC LIMIT ?""", period + (data_analysis.TOP_LIST_LEN,))
+    operators = cursor.fetchall()
+    conn.close()
+    return top_types_counts, misc_count, misc_types_counts, operators
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures the Parquet export and compares the analysis of the export "
+                                                 "with the SQL queries of data_analysis.py (on SQLite).")
+    parser.add_argument("-n", "--callsigns", type=int, default=1000000, help="Callsigns (default: 1000000).")
+    parser.add_argument("-p", "--positions", type=int, default=5, help="Positions per callsign (default: 5).")
+    args = parser.parse_args()
+
+    random.seed(1)
+    directory = Path(tempfile.mkdtemp())
+    database_path = str(directory.joinpath("planeradar.sqlite"))
+    database = SqliteDatabase(database_path, pragmas={"journal_mode": "wal"})
+    with database.bind_ctx([Callsigns, Positions]):
+        database.create_tables([Callsigns, Positions])
+        first_half = args.callsigns // 2
+        insert_rows(database, *create_rows(first_half, args.positions, 1, args.callsigns))
+
+        export_path = directory.joinpath("export")
+        for num_callsigns in [0, args.callsigns - first_half]:
+            if num_callsigns:
+                insert_rows(database, *create_rows(num_callsigns, args.positions, first_half + 1,
+                                                   args.callsigns))
+            start = time.perf_counter()
+            parquet_export.export.__wrapped__(export_path, 0)
+            print(f"Export took {time.perf_counter() - start:.2f} s.")
+        database.close()
+
+    size = sum(path.stat().st_size for path in export_path.rglob("*.parquet"))
+    print(f"Database: {os.path.getsize(database_path) / 1e6:.1f} MB, export: {size / 1e6:.1f} MB in "
+          f"{len(list(export_path.rglob('*.parquet')))} files")
+
+    start = time.perf_counter()
+    sql_result = query_sqlite(database_path)
+    sql_time = time.perf_counter() - start
+    start = time.perf_counter()
+    parquet_result = data_analysis.query_parquet(str(export_path))
+    parquet_time = time.perf_counter() - start
+
+    # Types and operators with the same count may be ordered differently, so only the counts are compared.
+    assert sql_result[0] and sql_result[1] == parquet_result[1]
+    for sql_rows, parquet_rows in zip(sql_result[::2] + sql_result[3:], parquet_result[::2] + parquet_result[3:]):
+        assert sorted(row[1] for row in sql_rows) == sorted(row[1] for row in parquet_rows)
+    print(f"Analysis: SQL {sql_time:.2f} s, Parquet {parquet_time:.2f} s ({sql_time / parquet_time:.1f}x)")
@@ -0,0 +1,50 @@
+import argparse
+import datetime
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from SBSMessage import SBS_DATETIME_FORMAT, parse_sbs_datetime  # noqa: E402
+
+
+def read_timestamps(capture_file: str | None, num_messages: int) -> list[tuple[str, str]]:
+    if capture_file is None:
+        # Synthetic capture: dump1090 emits many messages within the same second.
+        start = datetime.datetime(2025, 3, 1, 12, 0, 0)
+        return [((start + datetime.timedelta(milliseconds=7 * i)).strftime("%Y/%m/%d"),
+                 (start + datetime.timedelta(milliseconds=7 * i)).strftime("%H:%M:%S.%f")[:-3])
+                for i in range(num_messages)]
+
+    timestamps = []
+    with open(capture_file, "r") as f:
+        for line in f:
+            fields = line.replace(" ", "").split(",")
+            if len(fields) > 7 and fields[0] == "MSG":
+                timestamps.append((fields[6], fields[7]))
+    return timestamps
+
+
+def parse_with_strptime(timestamps: list[tuple[str, str]]):
+    for date_str, time_str in timestamps:
+        datetime.datetime.strptime(f"{date_str} {time_str}", SBS_DATETIME_FORMAT)
+
+
+def parse_with_decoder(timestamps: list[tuple[str, str]]):
+    for date_str, time_str in timestamps:
+        parse_sbs_datetime(date_str, time_str)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares strptime with the SBS timestamp decoder.")
+    parser.add_argument("-f", "--file", help="Recorded SBS capture (e.g. 'nc localhost 30003 > capture.txt').")
+    parser.add_argument("-n", "--num", type=int, default=100000, help="Number of synthetic messages (default: 100000).")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Number of repetitions (default: 5).")
+    args = parser.parse_args()
+
+    timestamps = read_timestamps(args.file, args.num)
+    print(f"Messages: {len(timestamps)}")
+    for name, function in [("strptime", parse_with_strptime), ("decoder", parse_with_decoder)]:
+        best = min(timeit.repeat(lambda: function(timestamps), number=1, repeat=args.repeat))
+        print(f"{name:10s} {best * 1e9 / len(timestamps):8.0f} ns/message")
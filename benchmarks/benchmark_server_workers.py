@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import requests
+import websockets
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPOSITORY))
+
+from update_channel import UpdateChannel  # noqa: E402
+
+UPDATE_SIZE_IN_BYTES = 1200  # about the size of an update with a few approaching planes.
+
+
+def start_server(num_workers: int, port: int, socket_path: str) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, "planeradar_server.py", "--workers", str(num_workers), "--port",
+                               str(port)], cwd=REPOSITORY, env={**os.environ, "BROADCAST_SOCKET_PATH": socket_path},
+                              stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/observers", timeout=1)
+            if os.path.exists(socket_path):
+                time.sleep(num_workers * 0.5)  # until all workers are subscribed to the hub.
+                return server
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("Server did not start.")
+
+
+def run_clients(url: str, num_clients: int, run: int, num_updates: int, timeout: float, ready, results):
+    """Connects the WebSocket clients and returns the latencies of the updates of the run they received."""
+
+    async def run_client(latencies: list[float]):
+        async with websockets.connect(url, max_queue=None) as websocket:
+            await websocket.recv()  # latest data
+            ready.release()
+            received = 0
+            while received < num_updates:
+                message = json.loads(await websocket.recv())
+                if message.get("run") == run:
+                    latencies.append(time.monotonic() - message["sent"])
+                    received += 1
+
+    async def run_all() -> list[float]:
+        latencies = []
+        tasks = [asyncio.create_task(run_client(latencies)) for _ in range(num_clients)]
+        await asyncio.wait(tasks, timeout=timeout)
+        for task in tasks:
+            task.cancel()
+        return latencies
+
+    results.put(asyncio.run(run_all()))
+
+
+def measure(port: int, socket_path: str, num_clients: int, num_client_processes: int, run: int, num_updates: int,
+            rate: float) -> (float, float):
+    """Returns the share of updates received by the clients and the 99th percentile of the latency in ms."""
+    ready = multiprocessing.Semaphore(0)
+    results = multiprocessing.Queue()
+    timeout = num_updates / rate + 10
+    processes = []
+    for i in range(num_client_processes):
+        clients = num_clients // num_client_processes + (i < num_clients % num_client_processes)
+        processes.append(multiprocessing.Process(target=run_clients, args=(
+            f"ws://127.0.0.1:{port}/ws", clients, run, num_updates, timeout, ready, results)))
+        processes[-1].start()
+    for _ in range(num_clients):
+        ready.acquire()
+
+    channel = UpdateChannel(socket_path)
+    update = {"run": run, "padding": "x" * UPDATE_SIZE_IN_BYTES}
+    for _ in range(num_updates):
+        update["sent"] = time.monotonic()
+        channel.send(update)
+        time.sleep(1 / rate)
+    channel.close()
+
+    latencies = sorted(latency for _ in processes for latency in results.get())
+    for process in processes:
+        process.join()
+    if not latencies:
+        return 0.0, float("inf")
+    return len(latencies) / (num_clients * num_updates), latencies[int(len(latencies) * 0.99) - 1] * 1e3
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures how many WebSocket clients the planeradar_server can serve "
+                                                 "by number of workers.")
+    parser.add_argument("-w", "--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="Numbers of workers to test (default: 1 2 4).")
+    parser.add_argument("-c", "--clients", type=int, nargs="+", default=[100, 200, 400, 800, 1600],
+                        help="Numbers of clients to test (default: 100 200 400 800 1600).")
+    parser.add_argument("-r", "--rate", type=float, default=10, help="Updates per second (default: 10).")
+    parser.add_argument("-n", "--updates", type=int, default=50, help="Updates per measurement (default: 50).")
+    parser.add_argument("-l", "--latency-limit", type=float, default=250,
+                        help="Maximum 99th percentile of the latency in ms to serve the clients (default: 250).")
+    parser.add_argument("-p", "--port", type=int, default=8766, help="Port of the server (default: 8766).")
+    args = parser.parse_args()
+
+    num_client_processes = max(1, (os.cpu_count() or 1) // 2)
+    print(f"{os.cpu_count()} CPUs, {num_client_processes} client processes, {args.rate:g} updates/s of "
+          f"{UPDATE_SIZE_IN_BYTES} bytes")
+    print("workers  clients  received  p99 latency (ms)")
+    run = 0
+    for num_workers in args.workers:
+        socket_path = os.path.join(tempfile.mkdtemp(), "planeradar.sock")
+        server = start_server(num_workers, args.port, socket_path)
+        capacity = 0
+        try:
+            for num_clients in args.clients:
+                run += 1
+                received, p99 = measure(args.port, socket_path, num_clients, num_client_processes, run, args.updates,
+                                        args.rate)
+                print(f"{num_workers:7d}  {num_clients:7d}  {received:8.1%}  {p99:16.1f}")
+                if received < 0.99 or p99 > args.latency_limit:
+                    break
+                capacity = num_clients
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{num_workers} worker(s) serve at least {capacity} clients.")
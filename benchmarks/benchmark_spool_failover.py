@@ -0,0 +1,158 @@
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from peewee import OperationalError, SqliteDatabase
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DATABASE_PORT", "3306")
+
+import db_spool  # noqa: E402
+from database_models import Callsigns, GeofenceEvents, Positions  # noqa: E402
+from db_spool import DatabaseSpool  # noqa: E402
+
+MODELS = [Callsigns, Positions, GeofenceEvents]
+
+
+class FlakyDatabase(SqliteDatabase):
+    """SQLite stand-in for MariaDB that can be unreachable, fail a single statement or lose the reply to a commit."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.available = True
+        self.fail_on: str | None = None
+        self.lose_next_commit = False
+
+    def execute_sql(self, sql, params=None, *args, **kwargs):
+        if not self.available:
+            raise OperationalError("database unreachable")
+        if self.fail_on is not None and self.fail_on in sql:
+            self.fail_on = None
+            raise OperationalError("connection lost during the statement")
+        return super().execute_sql(sql, params, *args, **kwargs)
+
+    def commit(self):
+        result = super().commit()
+        if self.lose_next_commit:
+            self.lose_next_commit = False
+            raise OperationalError("connection lost after the commit")
+        return result
+
+
+def create_plane(spool: DatabaseSpool, index: int, start: datetime.datetime) -> (Callsigns, list[Positions]):
+    """Saves a callsign with its first and latest position, within the same second, and a geofence event."""
+    generated = start + datetime.timedelta(seconds=index)
+    callsign = Callsigns(hex_ident=f"{index:06X}", callsign=f"DLH{index}", first_message_generated=generated,
+                         first_message_received=generated, last_message_generated=generated,
+                         last_message_received=generated, num_messages=1)
+    spool.save(callsign)
+    positions = []
+    for num in range(2):
+        position = Positions(hex_ident=callsign.hex_ident, latitude=50.0, longitude=8.5, altitude=5000 - num,
+                             distance=10.0 - num, bearing=1.0, message_generated=generated,
+                             message_received=generated, num_message=num)
+        spool.save(position, {"callsign_id": callsign})
+        positions.append(position)
+    spool.save(GeofenceEvents(zone="Airport", hex_ident=callsign.hex_ident, event="enter", altitude=5000,
+                              message_generated=generated, message_received=generated), {"callsign_id": callsign})
+    return callsign, positions
+
+
+def update_plane(spool: DatabaseSpool, callsign: Callsigns, positions: list[Positions], num_updates: int):
+    """Updates the latest position and the counters of the plane, the spool only keeps their latest state."""
+    latest = positions[1]
+    for _ in range(num_updates):
+        latest.num_message += 1
+        latest.distance -= 0.1
+        spool.save(latest, {"callsign_id": callsign})
+    callsign.num_messages += num_updates
+    spool.save_fields([callsign], [Callsigns.num_messages])
+
+
+def drain_until_empty(spool: DatabaseSpool) -> int:
+    calls = 0
+    while spool.size:
+        spool.next_retry = 0
+        spool.drain_if_due()
+        calls += 1
+    return calls
+
+
+def count_rows() -> dict[str, int]:
+    return {model._meta.table_name: model.select().count() for model in MODELS}
+
+
+def check(planes: list[tuple[Callsigns, list[Positions]]]):
+    assert count_rows() == {"callsigns": len(planes), "positions": 2 * len(planes), "geofence_events": len(planes)}
+    for callsign, positions in planes:
+        stored = Callsigns.get_by_id(callsign.id)
+        assert (stored.hex_ident, stored.num_messages) == (callsign.hex_ident, callsign.num_messages)
+        for position in positions:
+            stored = Positions.get_by_id(position.id)
+            assert stored.callsign_id == callsign.id, "position references the wrong callsign"
+            assert stored.num_message == position.num_message, "position overwritten by another position"
+        event = GeofenceEvents.get(GeofenceEvents.hex_ident == callsign.hex_ident)
+        assert event.callsign_id == callsign.id, "geofence event references the wrong callsign"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks that the database spool loses and duplicates no rows when the "
+                                                 "database fails and recovers (on SQLite).")
+    parser.add_argument("-n", "--planes", type=int, default=500, help="Planes seen during the outage (default: 500).")
+    parser.add_argument("-u", "--updates", type=int, default=20,
+                        help="Updates of every plane during the outage (default: 20).")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    database = FlakyDatabase(os.path.join(directory, "planeradar.sqlite"), pragmas={"journal_mode": "wal"})
+    start = datetime.datetime(2025, 6, 1, 12, 0, 0, 500000)
+    with database.bind_ctx(MODELS):
+        database.create_tables(MODELS)
+        spool = DatabaseSpool(os.path.join(directory, "spool.sqlite"))
+
+        # The first plane is written directly, the others while the database is unreachable.
+        planes = [create_plane(spool, 0, start)]
+        assert spool.size == 0 and count_rows()["positions"] == 2
+        database.available = False
+        planes += [create_plane(spool, i, start) for i in range(1, args.planes + 1)]
+        for callsign, positions in planes:
+            update_plane(spool, callsign, positions, args.updates)
+        spooled = spool.size
+        assert spooled == 4 * args.planes + 2, "every row is spooled once with its latest state"
+        print(f"Spooled {spooled} rows of {args.planes} planes with {args.updates} updates each.")
+
+        # Batches of two rows put the two positions of a plane into different batches. The first batch is written, the
+        # second fails in the middle and is rolled back, then it is committed but the reply is lost. Its rows are
+        # retried in flight, while the first position of the plane is already in the database.
+        db_spool.SPOOL_DRAIN_BATCH_SIZE = 2
+        db_spool.SPOOL_DRAIN_BATCHES_PER_CALL = 1
+        database.available = True
+        assert count_rows() == {"callsigns": 1, "positions": 2, "geofence_events": 1}
+        for failure in [None, "fail_on", "lose_next_commit"]:
+            if failure == "fail_on":
+                database.fail_on = "INSERT INTO \"positions\""
+            elif failure == "lose_next_commit":
+                database.lose_next_commit = True
+            spool.next_retry = 0
+            spool.drain_if_due()
+            assert spool.database_available == (failure is None) and spool.size == spooled - 2
+        db_spool.SPOOL_DRAIN_BATCH_SIZE = 500
+        db_spool.SPOOL_DRAIN_BATCHES_PER_CALL = 10
+
+        start_drain = time.perf_counter()
+        calls = drain_until_empty(spool)
+        duration = time.perf_counter() - start_drain
+        assert spool.database_available and not spool.pending_models
+        check(planes)
+        print(f"Drained {spooled} rows in {calls} calls ({duration:.2f} s), all rows, ids and references match.")
+
+        # Neither a second drain nor a restart with the spool file adds any rows.
+        rows = count_rows()
+        spool.drain()
+        assert DatabaseSpool(spool.path).size == 0 and count_rows() == rows
+        print("A second drain adds no rows.")
+        database.close()
@@ -0,0 +1,156 @@
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+import websockets
+
+REPOSITORY = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPOSITORY))
+os.environ.setdefault("DATABASE_PORT", "3306")
+
+import planedata_processor as processor  # noqa: E402
+from cpa_predictor import ClosestApproach  # noqa: E402
+from database_models import Callsigns, Positions  # noqa: E402
+from db_spool import DatabaseSpool  # noqa: E402
+from geofences import GeofenceEvent  # noqa: E402
+from observers import CLOSEST, CLOSEST_LOW_ALT  # noqa: E402
+from update_channel import UpdateChannel  # noqa: E402
+
+
+def create_update(num_approaching: int, directory: str) -> dict:
+    """An update as broadcast by the data processor, built by its own broadcast code."""
+    processor.init_tracking()
+    now = datetime.datetime.now()
+    callsign = Callsigns(hex_ident="3C6444", callsign="DLH4AB", registration="D-AIZA", typecode="A320")
+    position = Positions(hex_ident=callsign.hex_ident, altitude=4375, distance=3.21, bearing=math.radians(87),
+                         message_received=now, num_message=1234)
+    processor.callsigns.append(callsign)
+    processor.closest_aircraft = processor.closest_aircraft_low_alt = position
+    processor.closest_aircraft_callsign = processor.closest_aircraft_low_alt_callsign = callsign
+    processor.approaching_aircraft = [ClosestApproach(f"{i:06X}", 44 + i, 1.2, 8.5, 6000)
+                                      for i in range(num_approaching)]
+    for index in range(len(processor.observer_tracker)):
+        for kind in [CLOSEST, CLOSEST_LOW_ALT]:
+            processor.observer_tracker.set_closest(index, kind, callsign, 3.21, math.radians(87), 4375)
+    processor.geofence_events.appendleft((GeofenceEvent(0, "Airport", callsign.hex_ident, True, 50.04, 8.56, 4375),
+                                          callsign.callsign, now))
+    processor.database_spool = DatabaseSpool(os.path.join(directory, "spool.sqlite"))
+
+    updates = []
+    send_data_to_server = processor.send_data_to_server
+    processor.send_data_to_server = updates.append
+    try:
+        processor.broadcast_closest_plane()
+    finally:
+        processor.send_data_to_server = send_data_to_server
+    return updates[0]
+
+
+def get_cpu_time(pid: int) -> float:
+    """User and system time of the process in seconds."""
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class Receiver(threading.Thread):
+    """WebSocket client of the server, recording the latency of every update from the time it was sent."""
+
+    def __init__(self, url: str):
+        super().__init__(daemon=True)
+        self.url = url
+        self.latencies: list[float] = []
+        self.connected = threading.Event()
+
+    def run(self):
+        asyncio.run(self.receive())
+
+    async def receive(self):
+        async with websockets.connect(self.url) as websocket:
+            await websocket.recv()  # initial data
+            self.connected.set()
+            try:
+                async for message in websocket:
+                    received = time.monotonic()
+                    sent = json.loads(message).get("sent")
+                    if sent is not None:
+                        self.latencies.append(received - sent)
+            except websockets.ConnectionClosed:
+                pass  # server stopped
+
+
+def run(send, update: dict, num_updates: int, interval: float, receiver: Receiver, server_pid: int) -> dict:
+    receiver.latencies.clear()
+    server_cpu = get_cpu_time(server_pid)
+    sender_cpu = time.thread_time()
+    for _ in range(num_updates):
+        update["sent"] = time.monotonic()
+        send(update)
+        time.sleep(interval)
+    sender_cpu = time.thread_time() - sender_cpu
+    deadline = time.monotonic() + 5
+    while len(receiver.latencies) < num_updates and time.monotonic() < deadline:
+        time.sleep(0.01)
+    server_cpu = get_cpu_time(server_pid) - server_cpu
+    latencies = sorted(receiver.latencies)
+    return {
+        "received": len(latencies),
+        "median": statistics.median(latencies) * 1e3,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+        "sender_cpu": sender_cpu * 1e6 / num_updates,
+        "server_cpu": server_cpu * 1e6 / num_updates,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the latency and CPU time of the updates sent from the data "
+                                                 "processor to the WebSocket clients over HTTP and the Unix socket.")
+    parser.add_argument("-n", "--updates", type=int, default=2000, help="Updates per path (default: 2000).")
+    parser.add_argument("-i", "--interval", type=float, default=0.002,
+                        help="Seconds between two updates (default: 0.002).")
+    parser.add_argument("-a", "--approaching", type=int, default=5,
+                        help="Approaching planes in every update (default: 5).")
+    parser.add_argument("-p", "--port", type=int, default=8765, help="Port of the server (default: 8765).")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    update = create_update(args.approaching, directory)
+    socket_path = os.path.join(directory, "planeradar.sock")
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "planeradar_server:app", "--port", str(args.port),
+                               "--log-level", "warning"], cwd=REPOSITORY,
+                              env={**os.environ, "BROADCAST_SOCKET_PATH": socket_path})
+    try:
+        while not os.path.exists(socket_path):
+            time.sleep(0.05)
+        receiver = Receiver(f"ws://127.0.0.1:{args.port}/ws")
+        receiver.start()
+        receiver.connected.wait(10)
+
+        update_url = f"http://127.0.0.1:{args.port}/update"
+        channel = UpdateChannel(socket_path)
+        paths = {
+            "HTTP POST": lambda data: requests.post(update_url, json=data),
+            "Unix socket": channel.send,
+        }
+        print(f"{args.updates} updates of {len(json.dumps(update))} bytes, "
+              f"one every {args.interval * 1e3:.1f} ms")
+        print("path         received  median (ms)  p99 (ms)  sender CPU (us/update)  server CPU (us/update)")
+        for name, send in paths.items():
+            result = run(send, update, args.updates, args.interval, receiver, server.pid)
+            print(f"{name:11s}  {result['received']:8d}  {result['median']:11.3f}  {result['p99']:8.3f}  "
+                  f"{result['sender_cpu']:22.1f}  {result['server_cpu']:22.1f}")
+        channel.close()
+    finally:
+        server.terminate()
+        server.wait()
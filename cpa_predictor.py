@@ -0,0 +1,123 @@
+import math
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+R0 = 6371.0
+KNOTS_TO_KM_PER_S = 1.852 / 3600
+MAX_DEAD_RECKONING_IN_SECONDS = 60  # positions are not extrapolated further than this.
+MAX_PREDICTION_HORIZON_IN_SECONDS = 600  # closest approaches are predicted at most this far ahead.
+INITIAL_CAPACITY = 256  # planes, the arrays grow as needed.
+
+
+class ClosestApproach(NamedTuple):
+    hex_ident: str
+    time_to_closest: float  # seconds from now, 0 if the plane is already moving away
+    closest_distance: float  # km
+    current_distance: float  # km, dead-reckoned
+    altitude: float  # feet, dead-reckoned
+
+
+class CPAPredictor:
+    """
+    Keeps the last position (MSG 3) and velocity (MSG 4) of all tracked aircraft and predicts their closest point of
+    approach to the observer.
+
+    Positions are stored in a flat local east/north frame (km) around the observer, using the same equirectangular
+    approximation as the distance calculation of the processor. The states of all aircraft are kept in one array with
+    a row per plane, so the prediction of all planes is a few array operations per tick instead of a loop.
+    """
+
+    def __init__(self, observer_position_in_radians: (float, float)):
+        self.observer_lat, self.observer_lon = observer_position_in_radians
+        self.f0 = math.cos(self.observer_lat)
+        self.rows: dict[str, int] = {}  # hex_ident -> row of the plane in the arrays
+        self.hex_idents: list[str | None] = []
+        self.free_rows: list[int] = []
+        # east, north, altitude, position time, east velocity, north velocity, vertical rate in ft/s
+        self.states = np.zeros((0, 7))
+        self.has_position = np.zeros(0, dtype=bool)
+        self.has_velocity = np.zeros(0, dtype=bool)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.has_position))
+
+    def get_row(self, hex_ident: str) -> int:
+        row = self.rows.get(hex_ident)
+        if row is not None:
+            return row
+        if not self.free_rows:
+            # The arrays grow by doubling, rows of removed planes are reused.
+            capacity = len(self.hex_idents)
+            new_capacity = max(INITIAL_CAPACITY, 2 * capacity)
+            self.states = np.concatenate([self.states, np.zeros((new_capacity - capacity, 7))])
+            self.has_position = np.concatenate([self.has_position, np.zeros(new_capacity - capacity, dtype=bool)])
+            self.has_velocity = np.concatenate([self.has_velocity, np.zeros(new_capacity - capacity, dtype=bool)])
+            self.hex_idents += [None] * (new_capacity - capacity)
+            self.free_rows = list(range(new_capacity - 1, capacity - 1, -1))
+        row = self.rows[hex_ident] = self.free_rows.pop()
+        self.hex_idents[row] = hex_ident
+        return row
+
+    def update_position(self, hex_ident: str, plane_position_in_radians: (float, float), altitude: float,
+                        now: float | None = None):
+        now = time.monotonic() if now is None else now
+        row = self.get_row(hex_ident)
+        self.states[row, :4] = (R0 * (plane_position_in_radians[1] - self.observer_lon) * self.f0,
+                                R0 * (plane_position_in_radians[0] - self.observer_lat), altitude, now)
+        self.has_position[row] = True
+
+    def update_velocity(self, hex_ident: str, ground_speed_in_knots: float, track_in_degrees: float,
+                        vertical_rate_in_feet_per_min: float):
+        speed = ground_speed_in_knots * KNOTS_TO_KM_PER_S
+        track = math.radians(track_in_degrees)
+        row = self.get_row(hex_ident)
+        self.states[row, 4:] = (speed * math.sin(track), speed * math.cos(track), vertical_rate_in_feet_per_min / 60)
+        self.has_velocity[row] = True
+
+    def remove(self, hex_ident: str):
+        row = self.rows.pop(hex_ident, None)
+        if row is None:
+            return
+        self.has_position[row] = self.has_velocity[row] = False
+        self.hex_idents[row] = None
+        self.free_rows.append(row)
+
+    def dead_reckon(self, hex_ident: str, now: float | None = None) -> tuple[float, float, float] | None:
+        """Returns the extrapolated distance (km), bearing (radians) and altitude (feet) of a plane to the observer."""
+        row = self.rows.get(hex_ident)
+        if row is None or not self.has_position[row]:
+            return None
+        east, north, altitude, position_time, v_east, v_north, v_altitude = self.states[row].tolist()
+        if self.has_velocity[row]:
+            now = time.monotonic() if now is None else now
+            elapsed = min(max(now - position_time, 0.0), MAX_DEAD_RECKONING_IN_SECONDS)
+            east, north, altitude = east + v_east * elapsed, north + v_north * elapsed, altitude + v_altitude * elapsed
+        return round(math.hypot(east, north), 2), math.atan2(east, north), altitude
+
+    def predict(self, now: float | None = None, limit: int | None = None) -> list[ClosestApproach]:
+        """
+        Computes the closest point of approach for all aircraft with known position and velocity at once. Returns the
+        planes that are still approaching, ordered by the predicted closest distance, at most limit of them.
+        """
+        now = time.monotonic() if now is None else now
+        rows = np.flatnonzero(self.has_position & self.has_velocity)
+        east, north, altitude, position_time, v_east, v_north, v_altitude = self.states[rows].T
+        elapsed = np.clip(now - position_time, 0.0, MAX_DEAD_RECKONING_IN_SECONDS)
+        east = east + v_east * elapsed
+        north = north + v_north * elapsed
+        altitude = altitude + v_altitude * elapsed
+        speed_squared = v_east * v_east + v_north * v_north
+        # Planes without speed have a time to closest of 0, the divisor only avoids dividing by zero.
+        time_to_closest = np.clip(-(east * v_east + north * v_north) / np.where(speed_squared > 0, speed_squared, 1),
+                                  0.0, MAX_PREDICTION_HORIZON_IN_SECONDS)
+        closest_distance = np.hypot(east + v_east * time_to_closest, north + v_north * time_to_closest)
+
+        approaching = np.flatnonzero(time_to_closest > 0)
+        # Only the returned planes are converted to Python objects, which costs more than the prediction itself.
+        order = approaching[np.argsort(closest_distance[approaching], kind="stable")][:limit]
+        return [ClosestApproach(self.hex_idents[row], seconds, closest, math.hypot(east_now, north_now), altitude_now)
+                for row, seconds, closest, east_now, north_now, altitude_now in zip(
+                    rows[order].tolist(), time_to_closest[order].tolist(), closest_distance[order].tolist(),
+                    east[order].tolist(), north[order].tolist(), altitude[order].tolist())]
@@ -1,140 +1,202 @@
+import argparse
 import csv
-import mariadb
-import matplotlib.pyplot as plt
 import os
+from pathlib import Path
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Database connection settings
-config = {
-    'host': os.getenv('DATABASE_HOST'),
-    'user': os.getenv('DATABASE_USER'),
-    'password': os.getenv('DATABASE_PW'),
-    'database': os.getenv('DATABASE_NAME')
-}
-
-# Establish database connection
-conn = mariadb.connect(**config)
-cursor = conn.cursor()
-
-# Execute SQL query to retrieve top types and their counts
-cursor.execute("""
-    SELECT typecode, COUNT(*) as count
-    FROM callsigns
-    WHERE typecode is not NULL
-    AND typecode != ''
-    AND first_message_received < '2025-05-17'
-    AND first_message_received > '2025-02-17'
-    GROUP BY typecode
-    ORDER BY count DESC
-    LIMIT 30
-""")
-top_types = cursor.fetchall()
-
-# Extract top types
-top_types_list = [row[0] for row in top_types]
-
-# Execute SQL query to retrieve count of top 5 types
-cursor.execute("""
-    SELECT typecode, COUNT(*) as count
-    FROM callsigns
-    WHERE typecode IN ({})
-    AND first_message_received < '2025-05-17'
-    AND first_message_received > '2025-02-17'
-    GROUP BY typecode
-    ORDER BY count
-""".format(','.join(['%s'] * len(top_types_list))), top_types_list)
-top_types_counts = cursor.fetchall()
-
-cursor.execute("""
-    SELECT COUNT(*) as count
-    FROM callsigns
-    WHERE typecode NOT IN ({})
-    AND first_message_received < '2025-05-17'
-    AND first_message_received > '2025-02-17'
-""".format(','.join(['%s'] * len(top_types_list))), top_types_list)
-misc_count = cursor.fetchone()[0]
-
-# Execute SQL query to retrieve types and counts for Misc group
-cursor.execute("""
-    SELECT typecode, COUNT(*) as count
-    FROM callsigns
-    WHERE typecode NOT IN ({})
-    AND first_message_received < '2025-05-17'
-    AND first_message_received > '2025-02-17'
-    GROUP BY typecode
-    ORDER BY count DESC
-""".format(','.join(['%s'] * len(top_types_list))), top_types_list)
-misc_types_counts = cursor.fetchall()
-
-cursor.execute("""
-    SELECT operator, COUNT(*) as count
-    FROM callsigns
-    WHERE first_message_received < '2025-05-17'
-    AND first_message_received > '2025-02-17'
-    and operator != ''
-    GROUP BY operator
-    ORDER BY count DESC
-    LIMIT 30
-""")
-operators = cursor.fetchall()
-
-# Close database connection
-conn.close()
-
-# Load the CSV file
-with open('aircraftDatabase.csv', 'r') as f:
-    reader = csv.DictReader(f)
-    aircraft_data = {}
-    for row in reader:
-        typecode = row['typecode']
-        if typecode and typecode not in aircraft_data:
-            aircraft_data[typecode] = {
-                'manufacturer': row['manufacturername'],
-                'model': row['model']
-            }
-
-# Map the ICAO typecodes to their corresponding aircraft names
-misc_types_counts_with_names = []
-for row in misc_types_counts:
-    typecode = row[0]
-    if typecode in aircraft_data:
-        name = f"{aircraft_data[typecode]['manufacturer']} {aircraft_data[typecode]['model']}"
+# Analyzed period of the first messages of the callsigns
+START_DATE = '2025-02-17'
+END_DATE = '2025-05-17'
+TOP_LIST_LEN = 30
+
+
+def query_database():
+    """Counts the types and operators with SQL queries against the database."""
+    import mariadb
+
+    # Database connection settings
+    config = {
+        'host': os.getenv('DATABASE_HOST'),
+        'user': os.getenv('DATABASE_USER'),
+        'password': os.getenv('DATABASE_PW'),
+        'database': os.getenv('DATABASE_NAME')
+    }
+
+    # Establish database connection
+    conn = mariadb.connect(**config)
+    cursor = conn.cursor()
+
+    # Execute SQL query to retrieve top types and their counts
+    cursor.execute("""
+        SELECT typecode, COUNT(*) as count
+        FROM callsigns
+        WHERE typecode is not NULL
+        AND typecode != ''
+        AND first_message_received < %s
+        AND first_message_received > %s
+        GROUP BY typecode
+        ORDER BY count DESC
+        LIMIT %s
+    """, (END_DATE, START_DATE, TOP_LIST_LEN))
+    top_types = cursor.fetchall()
+
+    # Extract top types
+    top_types_list = [row[0] for row in top_types]
+
+    # Execute SQL query to retrieve count of top 5 types
+    cursor.execute("""
+        SELECT typecode, COUNT(*) as count
+        FROM callsigns
+        WHERE typecode IN ({})
+        AND first_message_received < %s
+        AND first_message_received > %s
+        GROUP BY typecode
+        ORDER BY count
+    """.format(','.join(['%s'] * len(top_types_list))), top_types_list + [END_DATE, START_DATE])
+    top_types_counts = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT COUNT(*) as count
+        FROM callsigns
+        WHERE typecode NOT IN ({})
+        AND first_message_received < %s
+        AND first_message_received > %s
+    """.format(','.join(['%s'] * len(top_types_list))), top_types_list + [END_DATE, START_DATE])
+    misc_count = cursor.fetchone()[0]
+
+    # Execute SQL query to retrieve types and counts for Misc group
+    cursor.execute("""
+        SELECT typecode, COUNT(*) as count
+        FROM callsigns
+        WHERE typecode NOT IN ({})
+        AND first_message_received < %s
+        AND first_message_received > %s
+        GROUP BY typecode
+        ORDER BY count DESC
+    """.format(','.join(['%s'] * len(top_types_list))), top_types_list + [END_DATE, START_DATE])
+    misc_types_counts = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT operator, COUNT(*) as count
+        FROM callsigns
+        WHERE first_message_received < %s
+        AND first_message_received > %s
+        and operator != ''
+        GROUP BY operator
+        ORDER BY count DESC
+        LIMIT %s
+    """, (END_DATE, START_DATE, TOP_LIST_LEN))
+    operators = cursor.fetchall()
+
+    # Close database connection
+    conn.close()
+    return top_types_counts, misc_count, misc_types_counts, operators
+
+
+def count_values(table, column: str) -> list[tuple[str, int]]:
+    """Returns the values of the column with their number of rows, most frequent first."""
+    counts = table.group_by(column).aggregate([([], 'count_all')]).sort_by([('count_all', 'descending')])
+    return list(zip(counts[column].to_pylist(), counts['count_all'].to_pylist()))
+
+
+def query_parquet(export_path: str):
+    """Counts the types and operators in the Parquet export of parquet_export.py, without touching the database."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+
+    # Only the partitions of the period are read
+    dataset = ds.dataset(Path(export_path).joinpath('callsigns'), format='parquet',
+                         partitioning=ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive'))
+    start, end = pa.scalar(START_DATE).cast(pa.timestamp('us')), pa.scalar(END_DATE).cast(pa.timestamp('us'))
+    callsigns = dataset.to_table(
+        columns=['typecode', 'operator'],
+        filter=(ds.field('date') >= START_DATE) & (ds.field('date') <= END_DATE)
+               & (ds.field('first_message_received') < end) & (ds.field('first_message_received') > start))
+    callsigns = callsigns.unify_dictionaries()  # every file has its own dictionaries
+
+    types = callsigns.filter(pc.is_valid(callsigns['typecode']))
+    type_counts = count_values(types, 'typecode')
+    top_types_list = [typecode for typecode, _ in type_counts if typecode != ''][:TOP_LIST_LEN]
+    top_types_counts = [row for row in reversed(type_counts) if row[0] in top_types_list]
+    misc_types_counts = [row for row in type_counts if row[0] not in top_types_list]
+    misc_count = sum(count for _, count in misc_types_counts)
+
+    operators = callsigns.filter(pc.not_equal(callsigns['operator'], ''))
+    return top_types_counts, misc_count, misc_types_counts, count_values(operators, 'operator')[:TOP_LIST_LEN]
+
+
+def show_bar_chart(labels: list[str], sizes: list[int], ylabel: str, title: str, invert: bool):
+    import matplotlib.pyplot as plt
+
+    plt.figure(figsize=(10, 6))
+    plt.barh(labels, sizes)
+    plt.xlabel('Count')
+    plt.ylabel(ylabel)
+    plt.title(title)
+    if invert:
+        plt.gca().invert_yaxis()
+    plt.tight_layout()
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyzes the types and operators of the planes seen.')
+    parser.add_argument('-p', '--parquet', type=str, nargs='?', const=os.getenv('EXPORT_PATH', 'export'),
+                        help='Read the Parquet export instead of the database (default: EXPORT_PATH or export).')
+    args = parser.parse_args()
+
+    if args.parquet:
+        top_types_counts, misc_count, misc_types_counts, operators = query_parquet(args.parquet)
     else:
-        name = typecode
-    misc_types_counts_with_names.append((typecode, name, row[1]))
-
-# Save the table to a CSV file
-with open('misc_planes.csv', 'w', newline='') as f:
-    writer = csv.writer(f)
-    writer.writerow(['ICAO Type Code', 'Aircraft Type', 'Count'])
-    writer.writerows(misc_types_counts_with_names)
-
-# Create lists for bar chart
-labels_top_5 = [f"{row[0]} ({row[1]})" for row in top_types_counts] + [f"Misc ({misc_count})"]
-sizes_top_5 = [row[1] for row in top_types_counts] + [misc_count]
-
-# Create bar chart
-plt.figure(figsize=(10, 6))
-plt.barh(labels_top_5, sizes_top_5)
-plt.xlabel('Count')
-plt.ylabel('Type')
-plt.title('Top Types and Misc')
-plt.tight_layout()
-plt.show()
-
-# Extract data for top operators
-labels_top_operators = [f"{row[0]} ({row[1]})" for row in operators]
-sizes_top_operators = [row[1] for row in operators]
-
-# Create bar chart
-plt.figure(figsize=(10, 6))
-plt.barh(labels_top_operators, sizes_top_operators)
-plt.xlabel('Count')
-plt.ylabel('Operator')
-plt.title('Top Operators')
-plt.gca().invert_yaxis()
-plt.tight_layout()
-plt.show()
+        top_types_counts, misc_count, misc_types_counts, operators = query_database()
+
+    # Load the CSV file
+    with open('aircraftDatabase.csv', 'r') as f:
+        reader = csv.DictReader(f)
+        aircraft_data = {}
+        for row in reader:
+            typecode = row['typecode']
+            if typecode and typecode not in aircraft_data:
+                aircraft_data[typecode] = {
+                    'manufacturer': row['manufacturername'],
+                    'model': row['model']
+                }
+
+    # Map the ICAO typecodes to their corresponding aircraft names
+    misc_types_counts_with_names = []
+    for row in misc_types_counts:
+        typecode = row[0]
+        if typecode in aircraft_data:
+            name = f"{aircraft_data[typecode]['manufacturer']} {aircraft_data[typecode]['model']}"
+        else:
+            name = typecode
+        misc_types_counts_with_names.append((typecode, name, row[1]))
+
+    # Save the table to a CSV file
+    with open('misc_planes.csv', 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['ICAO Type Code', 'Aircraft Type', 'Count'])
+        writer.writerows(misc_types_counts_with_names)
+
+    # Create lists for bar chart
+    labels_top_5 = [f"{row[0]} ({row[1]})" for row in top_types_counts] + [f"Misc ({misc_count})"]
+    sizes_top_5 = [row[1] for row in top_types_counts] + [misc_count]
+
+    # Create bar chart
+    show_bar_chart(labels_top_5, sizes_top_5, 'Type', 'Top Types and Misc', False)
+
+    # Extract data for top operators
+    labels_top_operators = [f"{row[0]} ({row[1]})" for row in operators]
+    sizes_top_operators = [row[1] for row in operators]
+
+    # Create bar chart
+    show_bar_chart(labels_top_operators, sizes_top_operators, 'Operator', 'Top Operators', True)
+
+
+if __name__ == '__main__':
+    main()
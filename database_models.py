@@ -38,3 +38,19 @@ class Positions(BaseModel):
     num_message = IntegerField()
 
 
+class GeofenceEvents(BaseModel):
+    id = IntegerField(primary_key=True)
+    zone = CharField()
+    hex_ident = CharField()
+    callsign_id = IntegerField(null=True)
+    event = CharField()
+    latitude = FloatField(null=True)
+    longitude = FloatField(null=True)
+    altitude = IntegerField(null=True)
+    message_generated = DateTimeField(null=True)
+    message_received = DateTimeField()
+
+    class Meta:
+        table_name = "geofence_events"
+
+
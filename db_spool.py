@@ -0,0 +1,281 @@
+import datetime
+import json
+import sqlite3
+import time
+import uuid
+from itertools import groupby
+
+from peewee import Case, Database, DateTimeField, Field, InterfaceError, Model, MySQLDatabase, OperationalError, Value
+
+from database_models import Callsigns, GeofenceEvents, Positions
+
+SPOOL_RETRY_INTERVAL_IN_SECONDS = 10
+SPOOL_DRAIN_BATCH_SIZE = 500
+SPOOL_DRAIN_BATCHES_PER_CALL = 10  # limits how long a single catch-up blocks the processing of new messages.
+SPOOL_DRAIN_PAUSE_IN_SECONDS = 1
+
+SPOOLED_MODELS = {model._meta.table_name: model for model in [Callsigns, Positions, GeofenceEvents]}
+# Fields identifying rows that may have been inserted by a drain that was interrupted before it was recorded.
+NATURAL_KEYS = {"callsigns": ["hex_ident", "callsign", "first_message_generated"],
+                "positions": ["callsign_id", "num_message", "message_generated"],
+                "geofence_events": ["zone", "hex_ident", "event", "message_received"]}
+
+
+def get_database() -> Database:
+    """Returns the database the models are bound to, MariaDB unless a benchmark binds them to SQLite."""
+    return Callsigns._meta.database
+
+
+class DatabaseSpool:
+    """
+    Local durable spool for database writes while MariaDB is unavailable.
+
+    Writes that fail are stored in an SQLite database in WAL mode. Every row is stored once with its latest state, so
+    a plane that is updated many times during an outage only needs a single write later. Once the database is
+    reachable again, the spool is drained in the order the rows were first written: rows that already have an id are
+    upserted in bulk, new rows are inserted and their ids are handed back to the models still held in memory. As long
+    as the spool is not empty, all writes go through it, so a drained row can never overwrite a newer state.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS spool (
+                    spool_key TEXT PRIMARY KEY,
+                    table_name TEXT NOT NULL,
+                    first_seq INTEGER NOT NULL,
+                    row TEXT NOT NULL,
+                    in_flight INTEGER NOT NULL DEFAULT 0
+                )""")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS spool_first_seq ON spool (first_seq)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS spool_ids (spool_key TEXT PRIMARY KEY, db_id INTEGER)")
+        self.next_seq = self.connection.execute("SELECT COALESCE(MAX(first_seq), 0) + 1 FROM spool").fetchone()[0]
+        self.size = self.connection.execute("SELECT COUNT(*) FROM spool").fetchone()[0]
+        self.pending_models: dict[str, Model] = {}
+        self.database_available = self.size == 0
+        self.next_retry = 0.0
+        self.drained_rows = 0
+        self.drain_rate = 0.0
+        if self.size:
+            print(f"Database spool contains {self.size} rows from a previous run.")
+
+    def get_stats(self) -> dict:
+        return {"size": self.size, "drained_rows": self.drained_rows, "drain_rate": round(self.drain_rate, 1),
+                "database_available": self.database_available}
+
+    def save(self, model: Model, foreign_keys: dict[str, Model] | None = None):
+        """
+        Saves the model to the database, or to the spool if the database is unavailable. foreign_keys maps fields of
+        the model to the models they reference, which may not have an id yet if they were spooled themselves.
+        """
+        foreign_keys = foreign_keys or {}
+        for field_name, referenced in foreign_keys.items():
+            if getattr(model, field_name) is None:
+                setattr(model, field_name, referenced.id)
+
+        if self.size > 0 or not self.database_available:
+            self.drain_if_due()
+        if self.size == 0 and self.database_available:
+            try:
+                model.save()
+                return
+            except (OperationalError, InterfaceError) as e:
+                self.mark_unavailable(e)
+        self.spool(model, foreign_keys)
+
+    def save_fields(self, models: list[Model], fields: list[Field]):
+        """
+        Writes the fields of models of the same class with a single UPDATE, setting each field with a CASE on the id.
+        Models without an id yet, and all models while the spool is in use, are saved one by one with their full
+        state instead, so the spool always holds the latest state of a row.
+        """
+        if self.size > 0 or not self.database_available:
+            self.drain_if_due()
+        stored = [model for model in models if model.id is not None]
+        if stored and self.size == 0 and self.database_available:
+            model_class = type(stored[0])
+            values = {field: Case(model_class.id, [(model.id, Value(getattr(model, field.name), field.db_value))
+                                                   for model in stored]) for field in fields}
+            try:
+                model_class.update(values).where(model_class.id.in_([model.id for model in stored])).execute()
+                models = [model for model in models if model.id is None]
+            except (OperationalError, InterfaceError) as e:
+                self.mark_unavailable(e)
+        for model in models:
+            self.save(model)
+
+    def spool(self, model: Model, foreign_keys: dict[str, Model]):
+        key = self.get_spool_key(model)
+        row = {name: value.isoformat() if isinstance(value, datetime.datetime) else value
+               for name, value in model.__data__.items()}
+        references = {field_name: self.get_spool_key(referenced) for field_name, referenced in foreign_keys.items()
+                      if getattr(model, field_name) is None}
+        if references:
+            row["_references"] = references
+        with self.connection:
+            # Rows keep their first position in the spool, only their state is replaced.
+            cursor = self.connection.execute("UPDATE spool SET row = ? WHERE spool_key = ?", (json.dumps(row), key))
+            if cursor.rowcount == 0:
+                self.connection.execute("INSERT INTO spool (spool_key, table_name, first_seq, row) VALUES (?, ?, ?, ?)",
+                                        (key, model._meta.table_name, self.next_seq, json.dumps(row)))
+                self.next_seq += 1
+                self.size += 1
+
+    def get_spool_key(self, model: Model) -> str:
+        if model.id is not None:
+            return f"{model._meta.table_name}:{model.id}"
+        key = getattr(model, "_spool_key", None)
+        if key is None:
+            key = f"{model._meta.table_name}:local:{uuid.uuid4().hex}"
+            model._spool_key = key
+            self.pending_models[key] = model
+        return key
+
+    def mark_unavailable(self, error: Exception):
+        if self.database_available:
+            print(f"Database unavailable ({error}). Spooling writes to {self.path}...")
+        self.database_available = False
+        self.next_retry = time.monotonic() + SPOOL_RETRY_INTERVAL_IN_SECONDS
+        try:
+            get_database().close()
+        except Exception:
+            pass  # the connection is already broken, it is reopened on the next attempt.
+
+    def drain_if_due(self):
+        if (self.size == 0 and self.database_available) or time.monotonic() < self.next_retry:
+            return
+        try:
+            self.drain()
+            self.database_available = True
+            if self.size:
+                self.next_retry = time.monotonic() + SPOOL_DRAIN_PAUSE_IN_SECONDS
+        except (OperationalError, InterfaceError) as e:
+            self.mark_unavailable(e)
+
+    def drain(self):
+        start = time.monotonic()
+        drained = 0
+        for _ in range(SPOOL_DRAIN_BATCHES_PER_CALL):
+            rows = self.connection.execute(
+                "SELECT spool_key, table_name, row, in_flight FROM spool ORDER BY first_seq LIMIT ?",
+                (SPOOL_DRAIN_BATCH_SIZE,)).fetchall()
+            if not rows:
+                break
+            self.drain_batch(rows)
+            drained += len(rows)
+
+        if drained:
+            duration = time.monotonic() - start
+            self.drained_rows += drained
+            self.drain_rate = drained / max(duration, 1e-6)
+            print(f"Drained {drained} spooled rows in {duration:.2f} s ({self.drain_rate:.0f} rows/s), "
+                  f"{self.size} rows left.")
+
+    def drain_batch(self, rows: list[tuple]):
+        keys = [key for key, _, _, _ in rows]
+        placeholders = ",".join("?" * len(keys))
+        with self.connection:
+            self.connection.execute(f"UPDATE spool SET in_flight = 1 WHERE spool_key IN ({placeholders})", keys)
+
+        new_ids: dict[str, int] = {}
+        inserts: dict[type[Model], list[tuple[str, dict]]] = {}
+        pending_keys: set[str] = set()
+        upserts: dict[type[Model], list[dict]] = {}
+        database = get_database()
+        with database.atomic():
+            for key, table_name, row, in_flight in rows:
+                model_class = SPOOLED_MODELS[table_name]
+                data = json.loads(row)
+                if not pending_keys.isdisjoint(data.get("_references", {}).values()):
+                    # The row references a row that is not inserted yet, so it needs the id of that row first.
+                    self.insert_rows(inserts, new_ids)
+                    pending_keys.clear()
+                data = self.deserialize(model_class, data, new_ids)
+                if data.get("id") is None and in_flight:
+                    # A previous drain may have committed this row without recording it.
+                    data["id"] = self.find_existing_id(model_class, data)
+                    if data["id"] is not None:
+                        new_ids[key] = data["id"]
+                if data.get("id") is None:
+                    data.pop("id", None)
+                    inserts.setdefault(model_class, []).append((key, data))
+                    pending_keys.add(key)
+                else:
+                    upserts.setdefault(model_class, []).append(data)
+            self.insert_rows(inserts, new_ids)
+            for model_class, data in upserts.items():
+                # MySQL upserts on any unique key, SQLite needs the conflicting column.
+                conflict_target = None if isinstance(database, MySQLDatabase) else [model_class.id]
+                # Rows can be spooled with different sets of fields, so consecutive rows with the same fields are
+                # upserted together, in the order they were spooled.
+                for fields, run in groupby(data, key=lambda d: tuple(sorted(d.keys()))):
+                    model_class.insert_many(list(run)).on_conflict(
+                        conflict_target=conflict_target,
+                        preserve=[model_class._meta.fields[f] for f in fields if f != "id"]).execute()
+
+        with self.connection:
+            self.connection.execute(f"DELETE FROM spool WHERE spool_key IN ({placeholders})", keys)
+            self.connection.executemany("INSERT OR REPLACE INTO spool_ids (spool_key, db_id) VALUES (?, ?)",
+                                        new_ids.items())
+        for key, db_id in new_ids.items():
+            model = self.pending_models.pop(key, None)
+            if model is not None:
+                model.id = db_id
+        self.size -= len(keys)
+        if self.size == 0:
+            with self.connection:
+                self.connection.execute("DELETE FROM spool_ids")
+
+    @staticmethod
+    def insert_rows(inserts: dict[type[Model], list[tuple[str, dict]]], new_ids: dict[str, int]):
+        """
+        Inserts the new rows with one statement per run of consecutive rows of a model with the same fields and records
+        their ids, so the ids follow the order the rows were spooled. The ids of a multi-row INSERT are consecutive as
+        long as MariaDB runs with innodb_autoinc_lock_mode 0 or 1 (the default of 1 does).
+        """
+        for model_class, batch in inserts.items():
+            for _, run in groupby(batch, key=lambda row: tuple(sorted(row[1].keys()))):
+                rows = list(run)
+                insert_id = model_class.insert_many([data for _, data in rows]).execute()
+                # MySQL returns the id of the first inserted row, SQLite the id of the last one.
+                first_id = insert_id if isinstance(get_database(), MySQLDatabase) else insert_id - len(rows) + 1
+                for offset, (key, _) in enumerate(rows):
+                    new_ids[key] = first_id + offset
+        inserts.clear()
+
+    def deserialize(self, model_class: type[Model], data: dict, new_ids: dict[str, int]) -> dict:
+        for field_name, referenced_key in data.pop("_references", {}).items():
+            data[field_name] = self.resolve_spool_key(referenced_key, new_ids)
+        for name, value in data.items():
+            if value is not None and isinstance(model_class._meta.fields.get(name), DateTimeField):
+                data[name] = datetime.datetime.fromisoformat(value)
+        return data
+
+    def resolve_spool_key(self, key: str, new_ids: dict[str, int]) -> int | None:
+        if key in new_ids:
+            return new_ids[key]
+        if ":local:" not in key:
+            return int(key.rsplit(":", 1)[1])
+        row = self.connection.execute("SELECT db_id FROM spool_ids WHERE spool_key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def find_existing_id(model_class: type[Model], data: dict) -> int | None:
+        conditions = []
+        for name in NATURAL_KEYS[model_class._meta.table_name]:
+            field = model_class._meta.fields[name]
+            value = data.get(name)
+            if value is None:
+                return None
+            if isinstance(value, datetime.datetime):
+                # DATETIME columns drop the fraction of a second.
+                conditions.append(field.between(value - datetime.timedelta(seconds=1),
+                                                value + datetime.timedelta(seconds=1)))
+            else:
+                conditions.append(field == value)
+        existing = model_class.select(model_class.id).where(*conditions).first()
+        return existing.id if existing is not None else None
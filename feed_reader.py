@@ -0,0 +1,79 @@
+import datetime
+import socket
+import time
+
+from SBSMessage import SBSMessage
+from beast_decoder import BEAST_MODE_S_LONG, CPR_PAIR_MAX_AGE_IN_SECONDS, BeastDecoder, split_frames
+
+RECV_BUFFER_SIZE = 4096
+
+
+class SBSFeedReader:
+    """
+    Reads BaseStation (SBS) lines from a connected socket.
+
+    The socket is expected to have a timeout set, so that the caller regains control in regular intervals even if
+    no messages arrive.
+    """
+
+    def __init__(self, connection: socket.socket, aircraft_data: dict):
+        self.connection = connection
+        self.aircraft_data = aircraft_data
+        self.buffer = b""
+
+    def read_messages(self) -> list[SBSMessage] | None:
+        """Returns the complete messages received, an empty list on timeout and None if the feed was closed."""
+        try:
+            chunk = self.connection.recv(RECV_BUFFER_SIZE)
+        except socket.timeout:
+            return []
+        if not chunk:
+            return None
+
+        lines = (self.buffer + chunk).split(b"\n")
+        self.buffer = lines.pop()
+        return [SBSMessage(line.decode("utf-8", errors="replace").strip(), self.aircraft_data)
+                for line in lines if line.strip()]
+
+
+class BeastFeedReader:
+    """
+    Reads dump1090's Beast binary output from a connected socket and decodes it into SBSMessage records.
+
+    Frames are split directly from the receive buffer, so only frames containing escaped bytes are copied.
+    """
+
+    def __init__(self, connection: socket.socket, aircraft_data: dict, observer_position_in_degrees: (float, float)):
+        self.connection = connection
+        self.decoder = BeastDecoder(observer_position_in_degrees, aircraft_data)
+        self.buffer = bytearray()
+        self.last_prune = time.monotonic()
+
+    def read_messages(self) -> list[SBSMessage] | None:
+        """Returns the decoded messages received, an empty list on timeout and None if the feed was closed."""
+        try:
+            chunk = self.connection.recv(RECV_BUFFER_SIZE)
+        except socket.timeout:
+            return []
+        if not chunk:
+            return None
+
+        self.buffer += chunk
+        generated = datetime.datetime.now()
+        now = time.monotonic()
+        messages = []
+        with memoryview(self.buffer) as view:
+            frames, consumed = split_frames(self.buffer, view)
+            for frame_type, payload in frames:
+                if frame_type == BEAST_MODE_S_LONG:
+                    message = self.decoder.decode(payload, generated, now)
+                    if message is not None:
+                        messages.append(message)
+                if isinstance(payload, memoryview):
+                    payload.release()
+        del self.buffer[:consumed]
+
+        if now - self.last_prune > CPR_PAIR_MAX_AGE_IN_SECONDS:
+            self.last_prune = now
+            self.decoder.prune(now)
+        return messages
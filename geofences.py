@@ -0,0 +1,188 @@
+import json
+import math
+import os
+from typing import NamedTuple
+
+R0 = 6371.0
+GRID_CELL_SIZE_IN_DEG = 0.05  # about 5.5 km north-south.
+
+
+class Zone(NamedTuple):
+    name: str
+    points: list[tuple[float, float]]  # (latitude, longitude) in degrees, the center for radius zones
+    radius: float | None  # km, None for polygon zones
+
+
+class GeofenceEvent(NamedTuple):
+    zone_index: int
+    zone: str
+    hex_ident: str
+    entered: bool  # False if the plane left the zone or is no longer tracked
+    latitude: float
+    longitude: float
+    altitude: int
+
+
+def load_zones(path: str) -> list[Zone]:
+    """
+    Reads the geofence zones from a JSON file, a list of radius zones ({"name", "latitude", "longitude", "radius_km"})
+    and polygon zones ({"name", "points": [[latitude, longitude], ...]}). Returns no zones if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path, "r") as f:
+        definitions = json.load(f)
+
+    zones = []
+    for definition in definitions:
+        if "points" in definition:
+            if len(definition["points"]) < 3:
+                raise ValueError(f"Polygon zone {definition['name']} needs at least 3 points.")
+            points = [(float(latitude), float(longitude)) for latitude, longitude in definition["points"]]
+            zones.append(Zone(definition["name"], points, None))
+        else:
+            zones.append(Zone(definition["name"], [(float(definition["latitude"]), float(definition["longitude"]))],
+                              float(definition["radius_km"])))
+    return zones
+
+
+def get_bounding_box(zone: Zone) -> (float, float, float, float):
+    if zone.radius is None:
+        latitudes = [lat for lat, _ in zone.points]
+        longitudes = [lon for _, lon in zone.points]
+        return min(latitudes), min(longitudes), max(latitudes), max(longitudes)
+    latitude, longitude = zone.points[0]
+    delta_lat = math.degrees(zone.radius / R0)
+    delta_lon = delta_lat / math.cos(math.radians(latitude))
+    return latitude - delta_lat, longitude - delta_lon, latitude + delta_lat, longitude + delta_lon
+
+
+def is_in_radius(center: tuple[float, float], radius: float, latitude: float, longitude: float) -> bool:
+    delta_lat = math.radians(latitude - center[0])
+    delta_lon = math.radians(longitude - center[1]) * math.cos(math.radians(center[0]))
+    return R0 * R0 * (delta_lat * delta_lat + delta_lon * delta_lon) <= radius * radius
+
+
+def is_in_polygon(points: list[tuple[float, float]], latitude: float, longitude: float) -> bool:
+    """Ray casting in degrees, precise enough for zones of a few kilometers."""
+    inside = False
+    lat_j, lon_j = points[-1]
+    for lat_i, lon_i in points:
+        if (lat_i > latitude) != (lat_j > latitude):
+            if longitude < lon_i + (latitude - lat_i) * (lon_j - lon_i) / (lat_j - lat_i):
+                inside = not inside
+        lat_j, lon_j = lat_i, lon_i
+    return inside
+
+
+def is_in_zone(zone: Zone, latitude: float, longitude: float) -> bool:
+    if zone.radius is None:
+        return is_in_polygon(zone.points, latitude, longitude)
+    return is_in_radius(zone.points[0], zone.radius, latitude, longitude)
+
+
+class SpatialIndex:
+    """
+    Grid of lat/lon cells holding all tracked aircraft and the geofence zones overlapping each cell.
+
+    A position update only tests the zones registered in the cell of the plane, and the zones a plane is in are kept
+    with the plane, so enter and exit events come from comparing the zones of the new position with the previous ones.
+    The cost of an update depends on the number of zones overlapping a cell, not on the number of zones or planes.
+    """
+
+    def __init__(self, zones: list[Zone], cell_size_in_deg: float = GRID_CELL_SIZE_IN_DEG):
+        self.zones = zones
+        self.cell_size = cell_size_in_deg
+        self.zone_cells: dict[tuple[int, int], list[int]] = {}
+        for zone_index, zone in enumerate(zones):
+            min_lat, min_lon, max_lat, max_lon = get_bounding_box(zone)
+            min_row, min_column = self.get_cell(min_lat, min_lon)
+            max_row, max_column = self.get_cell(max_lat, max_lon)
+            for row in range(min_row, max_row + 1):
+                for column in range(min_column, max_column + 1):
+                    self.zone_cells.setdefault((row, column), []).append(zone_index)
+        self.aircraft_cells: dict[tuple[int, int], set[str]] = {}
+        # hex_ident -> [cell, latitude, longitude, altitude, indices of the zones the plane is in]
+        self.aircraft: dict[str, list] = {}
+        self.occupancy = [0] * len(zones)
+
+    def __len__(self) -> int:
+        return len(self.aircraft)
+
+    def get_cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return math.floor(latitude / self.cell_size), math.floor(longitude / self.cell_size)
+
+    def update(self, hex_ident: str, latitude: float, longitude: float, altitude: int) -> list[GeofenceEvent]:
+        """Moves the plane to its new position. Returns the zones it entered and left."""
+        cell = self.get_cell(latitude, longitude)
+        entry = self.aircraft.get(hex_ident)
+        if entry is None:
+            entry = self.aircraft[hex_ident] = [None, latitude, longitude, altitude, set()]
+        if entry[0] != cell:
+            if entry[0] is not None:
+                self.discard_from_cell(hex_ident, entry[0])
+            self.aircraft_cells.setdefault(cell, set()).add(hex_ident)
+            entry[0] = cell
+        entry[1], entry[2], entry[3] = latitude, longitude, altitude
+
+        previous_zones = entry[4]
+        zones = {zone_index for zone_index in self.zone_cells.get(cell, ())
+                 if is_in_zone(self.zones[zone_index], latitude, longitude)}
+        if zones == previous_zones:
+            return []
+        entry[4] = zones
+        events = []
+        for zone_index in zones - previous_zones:
+            self.occupancy[zone_index] += 1
+            events.append(GeofenceEvent(zone_index, self.zones[zone_index].name, hex_ident, True, latitude, longitude,
+                                        altitude))
+        for zone_index in previous_zones - zones:
+            self.occupancy[zone_index] -= 1
+            events.append(GeofenceEvent(zone_index, self.zones[zone_index].name, hex_ident, False, latitude, longitude,
+                                        altitude))
+        return events
+
+    def remove(self, hex_ident: str) -> list[GeofenceEvent]:
+        """Drops a plane that is no longer tracked. Returns exit events for the zones it was in."""
+        entry = self.aircraft.pop(hex_ident, None)
+        if entry is None:
+            return []
+        cell, latitude, longitude, altitude, zones = entry
+        self.discard_from_cell(hex_ident, cell)
+        for zone_index in zones:
+            self.occupancy[zone_index] -= 1
+        return [GeofenceEvent(zone_index, self.zones[zone_index].name, hex_ident, False, latitude, longitude, altitude)
+                for zone_index in zones]
+
+    def discard_from_cell(self, hex_ident: str, cell: tuple[int, int]):
+        hex_idents = self.aircraft_cells[cell]
+        hex_idents.discard(hex_ident)
+        if not hex_idents:
+            del self.aircraft_cells[cell]
+
+    def get_aircraft_in_box(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+        """Yields the planes in the cells overlapping the box as (hex_ident, latitude, longitude)."""
+        min_row, min_column = self.get_cell(min_lat, min_lon)
+        max_row, max_column = self.get_cell(max_lat, max_lon)
+        if (max_row - min_row + 1) * (max_column - min_column + 1) > len(self.aircraft_cells):
+            cells = [cell for cell in self.aircraft_cells
+                     if min_row <= cell[0] <= max_row and min_column <= cell[1] <= max_column]
+        else:
+            cells = [(row, column) for row in range(min_row, max_row + 1)
+                     for column in range(min_column, max_column + 1)]
+        for cell in cells:
+            for hex_ident in self.aircraft_cells.get(cell, ()):
+                entry = self.aircraft[hex_ident]
+                yield hex_ident, entry[1], entry[2]
+
+    def query_radius(self, latitude: float, longitude: float, radius: float) -> list[str]:
+        """Returns the planes within the radius (km) around the position."""
+        zone = Zone("", [(latitude, longitude)], radius)
+        return [hex_ident for hex_ident, lat, lon in self.get_aircraft_in_box(*get_bounding_box(zone))
+                if is_in_radius(zone.points[0], radius, lat, lon)]
+
+    def query_polygon(self, points: list[tuple[float, float]]) -> list[str]:
+        """Returns the planes within the polygon given as (latitude, longitude) points."""
+        zone = Zone("", points, None)
+        return [hex_ident for hex_ident, lat, lon in self.get_aircraft_in_box(*get_bounding_box(zone))
+                if is_in_polygon(points, lat, lon)]
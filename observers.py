@@ -0,0 +1,219 @@
+import math
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+R0 = 6371.0
+CLOSEST = 0
+CLOSEST_LOW_ALT = 1
+
+
+class Observer(NamedTuple):
+    name: str
+    latitude: float  # radians
+    longitude: float  # radians
+
+
+def load_observers() -> list[Observer]:
+    """
+    Reads the observers from OBSERVERS ("name:latitude,longitude;name:latitude,longitude;..."). Falls back to
+    LATITUDE and LONGITUDE as the only observer. The first observer is the primary one, whose closest planes are shown
+    on the screen and written to the database.
+    """
+    definition = os.getenv("OBSERVERS", "").strip()
+    if not definition:
+        return [Observer("default", math.radians(float(os.getenv("LATITUDE", 50.036))),
+                         math.radians(float(os.getenv("LONGITUDE", 8.553))))]
+
+    observers = []
+    for entry in definition.split(";"):
+        if not entry.strip():
+            continue
+        name, coordinates = entry.split(":")
+        latitude, longitude = coordinates.split(",")
+        observers.append(Observer(name.strip(), math.radians(float(latitude)), math.radians(float(longitude))))
+    names = [observer.name for observer in observers]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Observer names must be unique: {names}")
+    return observers
+
+
+class ObserverTracker:
+    """
+    Tracks the closest plane and the closest plane preferring low altitudes for every observer.
+
+    The distances and bearings of a batch of positions to all observers are computed as one matrix, using the same
+    equirectangular approximation for every observer. The closest planes are kept in arrays with one row per observer
+    and one column per kind (CLOSEST, CLOSEST_LOW_ALT), so every position is compared with all observers at once. The
+    slots held by a plane are also indexed by its hex_ident, so a plane does not need to be searched in the arrays.
+    """
+
+    def __init__(self, observers: list[Observer], preferred_altitude_limit: int, high_altitude_penalty: float):
+        self.observers = observers
+        self.preferred_altitude_limit = preferred_altitude_limit
+        self.high_altitude_penalty = high_altitude_penalty
+        self.latitudes = np.array([observer.latitude for observer in observers])
+        self.longitudes = np.array([observer.longitude for observer in observers])
+        self.cos_latitudes = np.cos(self.latitudes)
+        shape = (len(observers), 2)
+        # Added to the distances of low and high planes, the low altitude column is penalized for high planes.
+        self.penalties = np.array([[0, 0], [0, high_altitude_penalty]], dtype=float)
+        self.hex_idents = np.full(shape, None, dtype=object)
+        self.scores = np.full(shape, np.inf)  # distance, adjusted by the altitude penalty in the low altitude column
+        self.slots: dict[str, set[tuple[int, int]]] = {}  # hex_ident -> (observer index, kind) held by the plane
+        self.distances = np.zeros(shape)
+        self.bearings = np.zeros(shape)
+        self.altitudes = np.zeros(shape, dtype=np.int64)
+        self.callsigns = [[None, None] for _ in observers]
+
+    def __len__(self) -> int:
+        return len(self.observers)
+
+    def is_empty(self) -> bool:
+        return all(callsign is None for callsigns in self.callsigns for callsign in callsigns)
+
+    def measure(self, latitudes: list[float], longitudes: list[float]) -> (np.ndarray, np.ndarray):
+        """Returns the distances (km) and bearings (radians) of the positions (degrees) to all observers."""
+        delta_lat = np.radians(latitudes)[:, np.newaxis] - self.latitudes
+        delta_lon = (np.radians(longitudes)[:, np.newaxis] - self.longitudes) * self.cos_latitudes
+        return np.round(R0 * np.hypot(delta_lat, delta_lon), 2), np.arctan2(delta_lon, delta_lat)
+
+    def find_closer(self, hex_ident: str, distances: np.ndarray, altitude: int) -> np.ndarray | None:
+        """
+        Returns for every observer and kind whether the plane is now the closest one, None if it is not the closest
+        one of any observer.
+        """
+        closer = self.get_scores(distances, altitude) < self.scores
+        for slot in self.slots.get(hex_ident, ()):
+            closer[slot] = True
+        return closer if closer.any() else None
+
+    def update(self, closer: np.ndarray, hex_ident: str, callsign, distances: np.ndarray, bearings: np.ndarray,
+               altitude: int):
+        scores = self.get_scores(distances, altitude)
+        slots = self.slots.setdefault(hex_ident, set())
+        for index, kind in zip(*np.nonzero(closer)):
+            previous = self.hex_idents[index, kind]
+            if previous != hex_ident:
+                if previous is not None:
+                    self.release_slot(previous, (index, kind))
+                self.hex_idents[index, kind] = hex_ident
+                self.callsigns[index][kind] = callsign
+                slots.add((index, kind))
+        self.scores[closer] = scores[closer]
+        self.distances[closer] = np.broadcast_to(distances[:, np.newaxis], closer.shape)[closer]
+        self.bearings[closer] = np.broadcast_to(bearings[:, np.newaxis], closer.shape)[closer]
+        self.altitudes[closer] = altitude
+
+    def release_slot(self, hex_ident: str, slot: tuple[int, int]):
+        slots = self.slots[hex_ident]
+        slots.discard(slot)
+        if not slots:
+            del self.slots[hex_ident]
+
+    def get_scores(self, distances: np.ndarray, altitude: int) -> np.ndarray:
+        return distances[:, np.newaxis] + self.penalties[int(altitude >= self.preferred_altitude_limit)]
+
+    def remove(self, hex_ident: str) -> bool:
+        """Drops the plane from all observers. Returns True if it was the closest plane of any observer."""
+        slots = self.slots.pop(hex_ident, None)
+        if slots is None:
+            return False
+        for slot in slots:
+            self.hex_idents[slot] = None
+            self.scores[slot] = np.inf
+            self.callsigns[slot[0]][slot[1]] = None
+        return True
+
+    def get_closest(self, index: int, kind: int) -> tuple | None:
+        """Returns the callsign, distance, bearing and altitude of the closest plane of the kind for the observer."""
+        callsign = self.callsigns[index][kind]
+        if callsign is None:
+            return None
+        return (callsign, float(self.distances[index, kind]), float(self.bearings[index, kind]),
+                int(self.altitudes[index, kind]))
+
+    def set_closest(self, index: int, kind: int, callsign, distance: float, bearing: float, altitude: int):
+        """Sets the closest plane received from another process, which only carries the values needed for display."""
+        self.callsigns[index][kind] = callsign
+        self.distances[index, kind] = distance
+        self.bearings[index, kind] = bearing
+        self.altitudes[index, kind] = altitude
+
+
+class SingleObserverTracker(ObserverTracker):
+    """
+    ObserverTracker for a single observer, the default setup. The closest planes are compared and kept as Python
+    scalars, since the overhead of the numpy calls per position outweighs the gain for one observer. The distances and
+    bearings are returned with one column, like those of ObserverTracker, and the closer planes as a single row.
+    """
+
+    def __init__(self, observers: list[Observer], preferred_altitude_limit: int, high_altitude_penalty: float):
+        super().__init__(observers, preferred_altitude_limit, high_altitude_penalty)
+        self.latitude = observers[0].latitude
+        self.longitude = observers[0].longitude
+        self.cos_latitude = math.cos(self.latitude)
+        self.hex_idents = [None, None]
+        self.scores = [math.inf, math.inf]
+        self.closest = [None, None]  # distance, bearing and altitude of the closest plane of every kind
+
+    def measure(self, latitudes: list[float], longitudes: list[float]) -> (list[tuple], list[tuple]):
+        distances, bearings = [], []
+        for latitude, longitude in zip(latitudes, longitudes):
+            delta_lat = math.radians(latitude) - self.latitude
+            delta_lon = (math.radians(longitude) - self.longitude) * self.cos_latitude
+            distances.append((round(R0 * math.hypot(delta_lat, delta_lon), 2),))
+            bearings.append((math.atan2(delta_lon, delta_lat),))
+        return distances, bearings
+
+    def find_closer(self, hex_ident: str, distances: tuple, altitude: int) -> tuple | None:
+        distance = distances[0]
+        low_alt_score = distance + self.high_altitude_penalty if altitude >= self.preferred_altitude_limit else distance
+        is_closest = self.hex_idents[CLOSEST] == hex_ident or distance < self.scores[CLOSEST]
+        is_closest_low_alt = (self.hex_idents[CLOSEST_LOW_ALT] == hex_ident
+                              or low_alt_score < self.scores[CLOSEST_LOW_ALT])
+        if not is_closest and not is_closest_low_alt:
+            return None
+        return (is_closest, is_closest_low_alt),
+
+    def update(self, closer: tuple, hex_ident: str, callsign, distances: tuple, bearings: tuple, altitude: int):
+        distance = distances[0]
+        scores = [distance, distance + self.high_altitude_penalty
+                  if altitude >= self.preferred_altitude_limit else distance]
+        for kind, is_closer in enumerate(closer[0]):
+            if not is_closer:
+                continue
+            if self.hex_idents[kind] != hex_ident:
+                self.hex_idents[kind] = hex_ident
+                self.callsigns[0][kind] = callsign
+            self.scores[kind] = scores[kind]
+            self.closest[kind] = (distance, bearings[0], altitude)
+
+    def remove(self, hex_ident: str) -> bool:
+        removed = False
+        for kind in [CLOSEST, CLOSEST_LOW_ALT]:
+            if self.hex_idents[kind] == hex_ident:
+                self.hex_idents[kind] = None
+                self.scores[kind] = math.inf
+                self.callsigns[0][kind] = None
+                removed = True
+        return removed
+
+    def get_closest(self, index: int, kind: int) -> tuple | None:
+        callsign = self.callsigns[0][kind]
+        if callsign is None:
+            return None
+        return (callsign, *self.closest[kind])
+
+    def set_closest(self, index: int, kind: int, callsign, distance: float, bearing: float, altitude: int):
+        self.callsigns[0][kind] = callsign
+        self.closest[kind] = (distance, bearing, altitude)
+
+
+def create_observer_tracker(observers: list[Observer], preferred_altitude_limit: int,
+                            high_altitude_penalty: float) -> ObserverTracker:
+    """Returns the tracker for the observers, with scalar math if there is only one."""
+    if len(observers) == 1:
+        return SingleObserverTracker(observers, preferred_altitude_limit, high_altitude_penalty)
+    return ObserverTracker(observers, preferred_altitude_limit, high_altitude_penalty)
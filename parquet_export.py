@@ -0,0 +1,160 @@
+import argparse
+import datetime
+import json
+import os
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from dotenv import load_dotenv
+from peewee import fn
+
+from database_models import Callsigns, Positions
+from database_utils import use_db_connection
+
+load_dotenv()
+
+EXPORT_PATH = os.getenv("EXPORT_PATH", str(Path(__file__).resolve().parent.joinpath("export")))
+SETTLE_TIME_IN_HOURS = 2  # callsigns and positions are no longer updated once the plane has been gone this long.
+BATCH_SIZE = 200000
+WATERMARKS_FILE = "watermarks.json"
+
+TIMESTAMP = pa.timestamp("us")
+DICTIONARY = pa.dictionary(pa.int32(), pa.string())
+
+CALLSIGNS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("hex_ident", pa.string()),
+    ("callsign", DICTIONARY),
+    ("first_message_generated", TIMESTAMP),
+    ("first_message_received", TIMESTAMP),
+    ("last_message_generated", TIMESTAMP),
+    ("last_message_received", TIMESTAMP),
+    ("registration", pa.string()),
+    ("typecode", DICTIONARY),
+    ("operator", DICTIONARY),
+    ("num_messages", pa.int32()),
+    ("closest_dist", pa.float64()),
+    ("lowest_alt", pa.int32()),
+])
+
+POSITIONS_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("hex_ident", pa.string()),
+    ("callsign_id", pa.int64()),
+    ("latitude", pa.float64()),
+    ("longitude", pa.float64()),
+    ("altitude", pa.int32()),
+    ("distance", pa.float64()),
+    ("bearing", pa.float64()),
+    ("message_generated", TIMESTAMP),
+    ("message_received", TIMESTAMP),
+    ("num_message", pa.int32()),
+])
+
+# table -> (model, schema, column of the date partition, column that is updated as long as the row may change)
+EXPORTED_TABLES = {
+    "callsigns": (Callsigns, CALLSIGNS_SCHEMA, "first_message_received", "last_message_received"),
+    "positions": (Positions, POSITIONS_SCHEMA, "message_received", "message_received"),
+}
+
+
+def load_watermarks(export_path: Path) -> dict[str, int]:
+    """Returns the highest id exported of every table."""
+    path = export_path.joinpath(WATERMARKS_FILE)
+    if not path.exists():
+        return {table: 0 for table in EXPORTED_TABLES}
+    with open(path, "r") as f:
+        return {table: 0 for table in EXPORTED_TABLES} | json.load(f)
+
+
+def save_watermarks(export_path: Path, watermarks: dict[str, int]):
+    path = export_path.joinpath(WATERMARKS_FILE)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(watermarks, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def remove_unfinished_files(table_path: Path, watermark: int):
+    """Removes the files of an export that was interrupted before its watermark was saved, they are written again."""
+    for path in table_path.glob("date=*/*"):
+        if path.suffix == ".tmp" or int(path.name.split("-")[0]) > watermark:
+            path.unlink()
+
+
+def get_settled_id(model, settle_column: str, watermark: int, cutoff: datetime.datetime) -> int:
+    """
+    Returns the highest id up to which all rows are settled. Rows are exported in the order of their ids, so a row that
+    may still be updated holds back the rows after it.
+    """
+    column = getattr(model, settle_column)
+    first_unsettled_id = model.select(fn.MIN(model.id)).where((model.id > watermark) & (column >= cutoff)).scalar()
+    if first_unsettled_id is not None:
+        return first_unsettled_id - 1
+    return model.select(fn.MAX(model.id)).where(model.id > watermark).scalar() or watermark
+
+
+def to_table(rows: list[tuple], schema: pa.Schema) -> pa.Table:
+    """Converts the rows as returned by the database driver, Arrow also parses timestamps returned as strings."""
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays([pa.array(column).cast(field.type) for column, field in zip(columns, schema)],
+                                schema=schema)
+
+
+def write_partitions(table: pa.Table, table_path: Path, date_column: str):
+    """Appends the rows to the partitions of their dates as one file per date, named by the first and last id."""
+    dates = pc.strftime(table[date_column], format="%Y-%m-%d")
+    for date in pc.unique(dates).to_pylist():
+        partition = table.filter(pc.equal(dates, date))
+        ids = pc.min_max(partition["id"])
+        path = table_path.joinpath(f"date={date}", f"{ids['min']}-{ids['max']}.parquet")
+        path.parent.mkdir(parents=True, exist_ok=True)
+        pq.write_table(partition, f"{path}.tmp", compression="zstd")
+        os.replace(f"{path}.tmp", path)
+
+
+def export_table(table_name: str, export_path: Path, watermarks: dict[str, int], cutoff: datetime.datetime) -> int:
+    """Exports the settled rows added since the last export in batches. Returns the number of rows exported."""
+    model, schema, date_column, settle_column = EXPORTED_TABLES[table_name]
+    table_path = export_path.joinpath(table_name)
+    remove_unfinished_files(table_path, watermarks[table_name])
+    settled_id = get_settled_id(model, settle_column, watermarks[table_name], cutoff)
+    columns = [getattr(model, field.name) for field in schema]
+
+    exported = 0
+    while watermarks[table_name] < settled_id:
+        query = (model.select(*columns)
+                 .where((model.id > watermarks[table_name]) & (model.id <= settled_id))
+                 .order_by(model.id)
+                 .limit(BATCH_SIZE))
+        rows = model._meta.database.execute(query).fetchall()  # without converting every value in peewee
+        if not rows:
+            break
+        write_partitions(to_table(rows, schema), table_path, date_column)
+        watermarks[table_name] = rows[-1][0]
+        save_watermarks(export_path, watermarks)
+        exported += len(rows)
+    return exported
+
+
+@use_db_connection
+def export(export_path: Path, settle_time_in_hours: float):
+    export_path.mkdir(parents=True, exist_ok=True)
+    watermarks = load_watermarks(export_path)
+    cutoff = datetime.datetime.now() - datetime.timedelta(hours=settle_time_in_hours)
+    for table_name in EXPORTED_TABLES:
+        exported = export_table(table_name, export_path, watermarks, cutoff)
+        print(f"Exported {exported} {table_name} up to id {watermarks[table_name]}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Appends new callsigns and positions to date partitioned Parquet files.")
+    parser.add_argument("-o", "--output", type=str, default=EXPORT_PATH,
+                        help=f"Directory of the export (default: EXPORT_PATH or {EXPORT_PATH}).")
+    parser.add_argument("-s", "--settle-time", type=float, default=SETTLE_TIME_IN_HOURS,
+                        help=f"Hours after which rows are no longer updated and exported (default: "
+                             f"{SETTLE_TIME_IN_HOURS}).")
+    args = parser.parse_args()
+    export(Path(args.output), args.settle_time)
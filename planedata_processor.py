@@ -3,25 +3,32 @@ import concurrent.futures
 import csv
 import datetime
 import math
+import multiprocessing
 import os
+import signal
 import socket
+import struct
 import time
 import traceback
 from collections import deque
+from dataclasses import dataclass
+from functools import partial
 from io import StringIO
-from math import radians, sqrt, cos
+from math import radians
 from pathlib import Path
 
-import requests
-from PIL import ImageDraw, Image
-from PIL import ImageFont
 from dotenv import load_dotenv
-from luma.core.interface.serial import i2c
-from luma.emulator.device import pygame
-from luma.oled.device import sh1106  # For real LCD screen
 
 from SBSMessage import SBSMessage
-from database_models import Callsigns, Positions
+from cpa_predictor import CPAPredictor, ClosestApproach
+from database_models import Callsigns, GeofenceEvents, Positions
+from db_spool import DatabaseSpool
+from feed_reader import BeastFeedReader, SBSFeedReader
+from geofences import GeofenceEvent, SpatialIndex, load_zones
+from observers import CLOSEST, CLOSEST_LOW_ALT, ObserverTracker, create_observer_tracker, load_observers
+from ring_buffer import RingReader, SharedRingBuffer
+from timing_wheel import TimingWheel
+from update_channel import UpdateChannel
 
 ###############################################################################################
 # Global Settings
@@ -32,6 +39,11 @@ SCREEN_SWITCH_PIN = 23
 LOW_ALT_PRIO_SWITCH_PIN = 24
 LED_YELLOW_PIN = 27
 LED_GREEN_PIN = 17
+# Switch states, same values as GPIO.LOW and GPIO.HIGH, which are only available once the GPIO is initialized.
+SWITCH_LOW = 0
+SWITCH_HIGH = 1
+# Switch states without GPIO (headless mode): the screen is off and low altitude planes are not preferred.
+HEADLESS_SWITCH_STATES = {SCREEN_SWITCH_PIN: SWITCH_LOW, LOW_ALT_PRIO_SWITCH_PIN: SWITCH_HIGH}
 
 # Dev values:
 # Used to define switch states when run in a development environment without the actual switch.
@@ -39,19 +51,83 @@ DEV_SCREEN_SWITCH_STATE = True
 DEV_LOW_ALT_PRIO_SWITCH_STATE = False
 
 # Other Values
-R0 = 6371.0
 PREF_ALT_LIMIT_IN_FEET = 15000  # planes below this altitude will be preferred for the display.
 HIGH_ALT_DIST_PENALTY_IN_KM = 20
 MAX_MESSAGE_READ_RETRIES = 5
 BROADCAST_ENDPOINT = "update"
 AIRCRAFT_DATA_URL = "https://opensky-network.org/datasets/metadata/aircraftDatabase.csv"
 CALLSIGNS_LIST_MAX_LEN = 30
-MAX_TIME_WITHOUT_MESSAGE_IN_MIN = 1
+MAX_TIME_WITHOUT_MESSAGE_IN_MIN = 1  # planes without messages for this time are dropped from display and broadcast.
+# Only identification, position and velocity messages keep a plane alive, not altitude or squawk messages.
+AIRCRAFT_EXPIRY_TRANSMISSION_TYPES = {"1", "3", "4"}
+CALLSIGN_EXPIRY_IN_MIN = 60  # callsign entries are reused for the same plane within this time.
+EXPIRY_TICK_IN_SECONDS = 1
+EXPIRY_WHEEL_SLOTS = 4096  # should cover the longest expiry time in ticks to avoid multiple rounds per key.
+PREDICTION_INTERVAL_IN_SECONDS = 1
+APPROACHING_LIST_MAX_LEN = 3
+GEOFENCE_EVENTS_LIST_MAX_LEN = 10
+# Updates of a position are only written if the plane moved by one of these amounts since the last write.
+POSITION_WRITE_MIN_DISTANCE_CHANGE_IN_KM = 0.5
+POSITION_WRITE_MIN_ALTITUDE_CHANGE_IN_FEET = 250
+POSITION_WRITE_MIN_BEARING_CHANGE_IN_DEG = 2
+POSITION_WRITE_MAX_INTERVAL_IN_SECONDS = 30
+POSITION_WRITE_REPORT_INTERVAL_IN_SECONDS = 600
+# The message counts of the callsigns are written in bulk at this interval, instead of with every message.
+CALLSIGN_COUNTER_FLUSH_INTERVAL_IN_SECONDS = 30
+CALLSIGN_COUNTER_FIELDS = [Callsigns.num_messages, Callsigns.last_message_generated, Callsigns.last_message_received,
+                           Callsigns.registration, Callsigns.typecode, Callsigns.operator]
+
+# Multi-process mode
+FEED_RING_CAPACITY = 65536  # records, about 5 MB of shared memory.
+SNAPSHOT_RING_CAPACITY = 64
+WORKER_POLL_INTERVAL_IN_SECONDS = 0.02
+MISSING_RECORD_INT = -2 ** 31
+# transmission type, hex_ident, callsign, altitude, latitude, longitude, ground speed, track, vertical rate, generated
+FEED_RECORD = struct.Struct("<B8s8sidddddd")
+# present, callsign, registration, typecode, altitude, distance, bearing, message received, message number
+CLOSEST_SLOT_FORMAT = "?16s16s16sidddi"
+# present, callsign, current distance, closest distance, time to closest, altitude
+APPROACHING_SLOT_FORMAT = "?16sdddd"
+# present, callsign, distance, bearing, altitude
+OBSERVER_SLOT_FORMAT = "?16sddi"
+# present, zone index, callsign, entered, received, altitude
+GEOFENCE_EVENT_SLOT_FORMAT = "?i16s?di"
+# number of planes in a zone
+ZONE_OCCUPANCY_FORMAT = "i"
+# database available, spool size, drain rate
+SPOOL_STATS_FORMAT = "?id"
+CLOSEST_SLOT_FIELDS = 9
+APPROACHING_SLOT_FIELDS = 6
+OBSERVER_SLOT_FIELDS = 5
+GEOFENCE_EVENT_SLOT_FIELDS = 6
 
 ###############################################################################################
 # Program Code
 ###############################################################################################
 
+
+@dataclass
+class CallsignPositions:
+    """The first and the latest position of a callsign held in memory."""
+    callsign: Callsigns
+    first: Positions | None = None
+    latest: Positions | None = None
+    written_state: tuple | None = None  # distance, altitude, bearing and time of the last write of the latest position
+    unwritten_changes: bool = False
+
+
+@dataclass
+class CallsignCounters:
+    """The identification messages of a callsign since it was last written."""
+    callsign: Callsigns
+    num_messages: int
+    last_message_generated: datetime.datetime | None = None
+    last_message_received: datetime.datetime | None = None
+    registration: str | None = None
+    typecode: str | None = None
+    operator: str | None = None
+
+
 closest_aircraft: Positions | None = None
 closest_aircraft_low_alt: Positions | None = None
 closest_aircraft_callsign: Callsigns | None = None
@@ -60,32 +136,85 @@ last_screen_update: datetime.datetime | None = None
 was_screen_on: bool = False
 last_low_alt_prio_switch_state: bool = False
 callsigns: deque[Callsigns] = deque()
+expiry_wheel = TimingWheel(EXPIRY_TICK_IN_SECONDS, EXPIRY_WHEEL_SLOTS)
+cpa_predictor: CPAPredictor | None = None
+approaching_aircraft: list[ClosestApproach] = []
+last_prediction: float = 0
+callsign_positions: dict[int, CallsignPositions] = {}  # id(callsign) -> positions of the callsigns in memory
+position_updates: int = 0
+position_writes: int = 0
+last_position_write_report: float = 0
+callsign_counters: dict[int, CallsignCounters] = {}  # id(callsign) -> messages since the callsign was last written
+last_callsign_counter_flush: float = 0
+database_spool: DatabaseSpool | None = None
+database_spool_stats: dict | None = None  # received from the persistence worker in multi-process mode.
+# Latest geofence events, newest first: (event, callsign, received)
+geofence_events: deque[tuple[GeofenceEvent, str, datetime.datetime]] = deque(maxlen=GEOFENCE_EVENTS_LIST_MAX_LEN)
+zone_occupancy: list[int] | None = None  # received from the persistence worker in multi-process mode.
+update_channel: UpdateChannel | None = None
+observer_tracker: ObserverTracker | None = None  # set by init_tracking.
+spatial_index: SpatialIndex | None = None  # set by init_tracking.
+snapshot_record: struct.Struct | None = None  # set by init_tracking.
+has_broadcast: bool = False
+GPIO = None  # set by init_gpio, stays None in headless mode.
+device = None  # set by init_display, stays None in headless mode.
 
 load_dotenv()
 
 ENVIRONMENT = os.getenv("ENVIRONMENT")
 BROADCAST_ENDPOINT_URL = os.getenv("BROADCAST_SERVER_URL", "http://127.0.0.1:8000/") + BROADCAST_ENDPOINT
+BROADCAST_SOCKET_PATH = os.getenv("BROADCAST_SOCKET_PATH")
+DATABASE_SPOOL_PATH = os.getenv("DATABASE_SPOOL_PATH",
+                                str(Path(__file__).resolve().parent.joinpath("database_spool.sqlite")))
+GEOFENCES_PATH = os.getenv("GEOFENCES_PATH", str(Path(__file__).resolve().parent.joinpath("geofences.json")))
+
+
+def init_tracking():
+    """
+    Loads the observers and the geofence zones. Also builds the snapshot record, which holds the closest planes of all
+    observers and the occupancy of all zones.
+    """
+    global observer_tracker, spatial_index, snapshot_record
+    observer_tracker = create_observer_tracker(load_observers(), PREF_ALT_LIMIT_IN_FEET, HIGH_ALT_DIST_PENALTY_IN_KM)
+    spatial_index = SpatialIndex(load_zones(GEOFENCES_PATH))
+    # The closest planes of all observers and the occupancy of all zones are part of the snapshot, so its size depends
+    # on the number of observers and zones.
+    snapshot_record = struct.Struct("<" + 2 * CLOSEST_SLOT_FORMAT + APPROACHING_LIST_MAX_LEN * APPROACHING_SLOT_FORMAT
+                                    + 2 * len(observer_tracker) * OBSERVER_SLOT_FORMAT
+                                    + GEOFENCE_EVENTS_LIST_MAX_LEN * GEOFENCE_EVENT_SLOT_FORMAT
+                                    + len(spatial_index.zones) * ZONE_OCCUPANCY_FORMAT + SPOOL_STATS_FORMAT)
+
+
+def init_gpio():
+    global GPIO
+    if ENVIRONMENT == "development":
+        import Mock.GPIO as gpio
+    else:
+        import RPi.GPIO as gpio
 
-if ENVIRONMENT == "development":
-    import Mock.GPIO as GPIO
-else:
-    import RPi.GPIO as GPIO
+    gpio.cleanup()
+    gpio.setmode(gpio.BCM)
+    gpio.setup(SCREEN_SWITCH_PIN, gpio.IN, pull_up_down=gpio.PUD_UP)
+    gpio.setup(LOW_ALT_PRIO_SWITCH_PIN, gpio.IN, pull_up_down=gpio.PUD_UP)
+    gpio.setup(LED_YELLOW_PIN, gpio.OUT)
+    gpio.setup(LED_GREEN_PIN, gpio.OUT)
+    GPIO = gpio
 
-GPIO.cleanup()
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(SCREEN_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-GPIO.setup(LOW_ALT_PRIO_SWITCH_PIN, GPIO.IN, pull_up_down=GPIO.PUD_UP)
-GPIO.setup(LED_YELLOW_PIN, GPIO.OUT)
-GPIO.setup(LED_GREEN_PIN, GPIO.OUT)
 
-if ENVIRONMENT == 'development':
-    device = pygame(width=128, height=64, rotate=0)
-else:
-    serial = i2c(port=1, address=0x3C)
-    device = sh1106(serial)
+def init_display():
+    global device
+    if ENVIRONMENT == 'development':
+        from luma.emulator.device import pygame
+        device = pygame(width=128, height=64, rotate=0)
+    else:
+        from luma.core.interface.serial import i2c
+        from luma.oled.device import sh1106  # For real LCD screen
+        serial = i2c(port=1, address=0x3C)
+        device = sh1106(serial)
 
 
 def make_font(name, size):
+    from PIL import ImageFont
     font_path = str(Path(__file__).resolve().parent.joinpath('fonts', name))
     return ImageFont.truetype(font_path, size)
 
@@ -115,6 +244,8 @@ def get_aircraft_data(download_file: bool):
 
 
 def download_aircraft_data():
+    import requests
+
     # Path to the fallback local CSV file
     local_file = "aircraftDatabase.csv"
 
@@ -139,45 +270,87 @@ def download_aircraft_data():
 
 
 def handle_transmission_type_1(message: SBSMessage):
+    expiry_wheel.schedule(("callsign", message.hex_ident), CALLSIGN_EXPIRY_IN_MIN * 60)
     callsign = get_callsign_from_list(message)
     if callsign is None:
         callsign = create_callsign_entry(message)
-        callsign.save()
+        database_spool.save(callsign)
         print(f"Callsign added (id: {callsign.id}, hex_ident: {callsign.hex_ident}, callsign: {callsign.callsign}).")
         add_callsign_to_list(callsign)
-    callsign.last_message_generated = message.get_generated_datetime()
-    callsign.last_message_received = datetime.datetime.now()
-    callsign.num_messages = callsign.num_messages + 1
-    callsign.registration = message.registration
-    callsign.registration = message.registration
-    callsign.typecode = message.typecode
-    callsign.operator = message.operator
+    counters = callsign_counters.get(id(callsign))
+    if counters is None:
+        counters = callsign_counters[id(callsign)] = CallsignCounters(callsign, callsign.num_messages)
+    counters.num_messages += 1
+    counters.last_message_generated = message.get_generated_datetime()
+    counters.last_message_received = datetime.datetime.now()
+    counters.registration = message.registration
+    counters.typecode = message.typecode
+    counters.operator = message.operator
+
+
+def apply_callsign_counters(callsign: Callsigns):
+    """Copies the messages counted since the last write to the callsign, so that they are written with it."""
+    counters = callsign_counters.pop(id(callsign), None)
+    if counters is not None:
+        callsign.num_messages = counters.num_messages
+        callsign.last_message_generated = counters.last_message_generated
+        callsign.last_message_received = counters.last_message_received
+        callsign.registration = counters.registration
+        callsign.typecode = counters.typecode
+        callsign.operator = counters.operator
+
+
+def save_callsign(callsign: Callsigns):
+    apply_callsign_counters(callsign)
+    database_spool.save(callsign)
+
+
+def flush_callsign_counters():
+    """Writes the counters of all callsigns that received messages since the last flush with a single UPDATE."""
+    global last_callsign_counter_flush
+    last_callsign_counter_flush = time.monotonic()
+    counted_callsigns = [counters.callsign for counters in callsign_counters.values()]
+    for callsign in counted_callsigns:
+        apply_callsign_counters(callsign)
+    if counted_callsigns:
+        database_spool.save_fields(counted_callsigns, CALLSIGN_COUNTER_FIELDS)
 
 
 def get_callsign_from_list(message) -> Callsigns | None:
     global callsigns
     callsigns_matching_message = [c for c in callsigns if c.hex_ident == message.hex_ident]
-    callsign = callsigns_matching_message[-1] if callsigns_matching_message else None
-    one_hour_ago = datetime.datetime.now() - datetime.timedelta(hours=1)
-    if callsign is None or callsign.last_message_generated < one_hour_ago:
-        return None
-    return callsign
+    return callsigns_matching_message[-1] if callsigns_matching_message else None
 
 
 def add_callsign_to_list(callsign: Callsigns):
     global callsigns
     if len(callsigns) >= CALLSIGNS_LIST_MAX_LEN:
         removed_callsign = callsigns.popleft()
-        removed_callsign.save()
+        flush_position(removed_callsign)
+        callsign_positions.pop(id(removed_callsign), None)
+        save_callsign(removed_callsign)
     callsigns.append(callsign)
 
 
+def remove_callsign_from_list(hex_ident: str):
+    global callsigns
+    for callsign in [c for c in callsigns if c.hex_ident == hex_ident]:
+        callsigns.remove(callsign)
+        flush_position(callsign)
+        callsign_positions.pop(id(callsign), None)
+        save_callsign(callsign)
+        print(f"Callsign expired (id: {callsign.id}, hex_ident: {callsign.hex_ident}, callsign: {callsign.callsign}).")
+
+
 def create_callsign_entry(message: SBSMessage) -> Callsigns:
+    generated, received = message.get_generated_datetime(), datetime.datetime.now()
     callsign = Callsigns(
         hex_ident=message.hex_ident,
         callsign=message.callsign,
-        first_message_generated=message.get_generated_datetime(),
-        first_message_received=datetime.datetime.now(),
+        first_message_generated=generated,
+        first_message_received=received,
+        last_message_generated=generated,
+        last_message_received=received,
         registration=message.registration,
         typecode=message.typecode,
         operator=message.operator,
@@ -186,20 +359,29 @@ def create_callsign_entry(message: SBSMessage) -> Callsigns:
     return callsign
 
 
-def handle_transmission_type_3(message: SBSMessage) -> bool:
+def handle_transmission_type_3(message: SBSMessage, measurement: tuple | None) -> bool:
+    """
+    Updates the closest planes of all observers with the distances and bearings of the message to the observers.
+    Only the closest planes of the primary observer are written to the database.
+    """
     global closest_aircraft, closest_aircraft_low_alt, closest_aircraft_callsign, closest_aircraft_low_alt_callsign
+    if measurement is None:
+        return False
     try:
+        distances, bearings = measurement
         plane_position_in_radians = (radians(float(message.latitude)), radians(float(message.longitude)))
-        observer_position = get_observer_location_in_degrees()
-        distance = calculate_distance(plane_position_in_radians, observer_position)
         altitude = int(message.altitude)
-        is_closest = is_plane_closer(message.hex_ident, distance)
-        is_closest_low_alt = is_plane_closer_low_alt(message.hex_ident, distance, altitude)
+        cpa_predictor.update_position(message.hex_ident, plane_position_in_radians, altitude)
+        closer = observer_tracker.find_closer(message.hex_ident, distances, altitude)
+        if closer is None:
+            return False
+        callsign = get_callsign(closest_aircraft_callsign, closest_aircraft_low_alt_callsign, message)
+        if callsign is None:
+            return False
+        observer_tracker.update(closer, message.hex_ident, callsign, distances, bearings, altitude)
+        is_closest, is_closest_low_alt = closer[0]
         if is_closest or is_closest_low_alt:
-            callsign = get_callsign(closest_aircraft_callsign, closest_aircraft_low_alt_callsign, message)
-            if callsign is None:
-                return False
-            bearing = calculate_bearing(plane_position_in_radians, observer_position)
+            distance, bearing = float(distances[0]), float(bearings[0])
             position = create_or_update_position(bearing, callsign, distance, message)
             print(
                 f"Position added or updated (id: {position.id}, hex_ident: {position.hex_ident}, callsign_id: {position.callsign_id}).")
@@ -211,27 +393,148 @@ def handle_transmission_type_3(message: SBSMessage) -> bool:
                 closest_aircraft_low_alt_callsign = callsign
             save_closest_distance(callsign, distance)
             save_lowest_altitude(callsign, int(message.altitude))
-            return True
+        return True
+
+    except ValueError:
+        pass
+
+
+def handle_geofences(message: SBSMessage) -> bool:
+    """Moves the plane in the spatial index. Returns True if it entered or left a geofence zone."""
+    try:
+        events = spatial_index.update(message.hex_ident, float(message.latitude), float(message.longitude),
+                                      int(message.altitude))
+        record_geofence_events(events, message.get_generated_datetime())
+        return bool(events)
+    except ValueError:
         return False
 
+
+def record_geofence_events(events: list[GeofenceEvent], generated: datetime.datetime | None):
+    received = datetime.datetime.now()
+    for event in events:
+        callsign = get_callsign_from_list(event)
+        event_name = "enter" if event.entered else "exit"
+        geofence_event = GeofenceEvents(
+            zone=event.zone,
+            hex_ident=event.hex_ident,
+            callsign_id=callsign.id if callsign is not None else None,
+            event=event_name,
+            latitude=event.latitude,
+            longitude=event.longitude,
+            altitude=event.altitude,
+            message_generated=generated,
+            message_received=received
+        )
+        database_spool.save(geofence_event, {"callsign_id": callsign} if callsign is not None else None)
+        name = callsign.callsign if callsign is not None else event.hex_ident
+        geofence_events.appendleft((event, name, received))
+        print(f"Geofence {event_name} (zone: {event.zone}, hex_ident: {event.hex_ident}, callsign: {name}).")
+
+
+def handle_transmission_type_4(message: SBSMessage):
+    try:
+        cpa_predictor.update_velocity(message.hex_ident, float(message.ground_speed), float(message.track),
+                                      float(message.vertical_rate or 0))
     except ValueError:
         pass
 
 
+def update_approaching_aircraft() -> bool:
+    """Predicts the closest approach of all planes once per interval. Returns True if the ranking changed."""
+    global approaching_aircraft, last_prediction
+    now = time.monotonic()
+    if now - last_prediction < PREDICTION_INTERVAL_IN_SECONDS:
+        return False
+    last_prediction = now
+    approaches = cpa_predictor.predict(now, APPROACHING_LIST_MAX_LEN)
+    changed = bool(approaches) or bool(approaching_aircraft)
+    approaching_aircraft = approaches
+    return changed
+
+
 def create_or_update_position(bearing: float, callsign: Callsigns, distance: float, message: SBSMessage) -> Positions:
-    position_0 = Positions.select().where(Positions.callsign_id == callsign.id).first()
-    if position_0 is None:
-        position = create_position_entry(callsign, message, distance, bearing, 0)
+    # Positions are only ever created for callsigns held in memory, so they do not need to be looked up in the
+    # database, which also keeps this working while the database is unavailable.
+    global callsign_positions
+    entry = callsign_positions.get(id(callsign))
+    if entry is None or entry.callsign is not callsign:
+        entry = callsign_positions[id(callsign)] = CallsignPositions(callsign)
+    if entry.first is None:
+        position = entry.first = create_position_entry(callsign, message, distance, bearing, 0)
+    elif entry.latest is None:
+        position = entry.latest = create_position_entry(callsign, message, distance, bearing, 1)
+        if position is not None:
+            entry.written_state = get_written_state(position)
     else:
-        position_i = Positions.select().where(
-            (Positions.callsign_id == callsign.id) & (Positions.num_message > 0)).first()
-        if position_i is None:
-            position = create_position_entry(callsign, message, distance, bearing, 1)
-        else:
-            position = update_position_entry(position_i, message, distance, bearing)
+        position = update_position_entry(entry.latest, callsign, message, distance, bearing)
+        if position is not None:
+            save_position_if_moved(entry, is_new_extreme(callsign, distance, int(message.altitude)))
     return position
 
 
+def get_written_state(position: Positions) -> tuple:
+    return position.distance, int(position.altitude), position.bearing, time.monotonic()
+
+
+def is_new_extreme(callsign: Callsigns, distance: float, altitude: int) -> bool:
+    return (callsign.closest_dist is None or distance < callsign.closest_dist
+            or callsign.lowest_alt is None or altitude < callsign.lowest_alt)
+
+
+def has_position_moved(position: Positions, written_state: tuple) -> bool:
+    distance, altitude, bearing, written = written_state
+    bearing_change = abs((math.degrees(position.bearing - bearing) + 180) % 360 - 180)
+    return (abs(position.distance - distance) >= POSITION_WRITE_MIN_DISTANCE_CHANGE_IN_KM
+            or abs(int(position.altitude) - altitude) >= POSITION_WRITE_MIN_ALTITUDE_CHANGE_IN_FEET
+            or bearing_change >= POSITION_WRITE_MIN_BEARING_CHANGE_IN_DEG
+            or time.monotonic() - written >= POSITION_WRITE_MAX_INTERVAL_IN_SECONDS)
+
+
+def save_position_if_moved(entry: CallsignPositions, force: bool):
+    """
+    Writes the latest position of a callsign entry if the plane moved noticeably, the last write is too old or the
+    position is a new closest distance or lowest altitude. Otherwise the change is kept in memory until the next
+    write or until the plane expires.
+    """
+    global position_updates
+    position_updates += 1
+    if force or entry.written_state is None or has_position_moved(entry.latest, entry.written_state):
+        save_position(entry)
+    else:
+        entry.unwritten_changes = True
+
+
+def save_position(entry: CallsignPositions):
+    global position_writes
+    database_spool.save(entry.latest, {"callsign_id": entry.callsign})
+    entry.written_state = get_written_state(entry.latest)
+    entry.unwritten_changes = False
+    position_writes += 1
+
+
+def flush_position(callsign: Callsigns):
+    """Writes the final fix of the callsign if it has not been written yet."""
+    entry = callsign_positions.get(id(callsign))
+    if entry is not None and entry.callsign is callsign and entry.unwritten_changes:
+        save_position(entry)
+
+
+def flush_all_positions():
+    for entry in list(callsign_positions.values()):
+        if entry.unwritten_changes:
+            save_position(entry)
+    report_position_writes()
+
+
+def report_position_writes():
+    global last_position_write_report
+    last_position_write_report = time.monotonic()
+    if position_updates:
+        print(f"Position updates written: {position_writes} of {position_updates} "
+              f"({1 - position_writes / position_updates:.0%} fewer writes).")
+
+
 def get_callsign(closest_callsign, closest_low_alt_callsign, message) -> Callsigns | None:
     if closest_callsign is not None and closest_callsign.hex_ident == message.hex_ident:
         callsign = closest_callsign
@@ -245,16 +548,17 @@ def get_callsign(closest_callsign, closest_low_alt_callsign, message) -> Callsig
 def save_closest_distance(callsign: Callsigns, distance: float):
     if callsign.closest_dist is None or callsign.closest_dist > distance:
         callsign.closest_dist = distance
-        callsign.save()
+        save_callsign(callsign)
 
 
 def save_lowest_altitude(callsign: Callsigns, height: int):
     if callsign.lowest_alt is None or callsign.lowest_alt > height:
         callsign.lowest_alt = height
-        callsign.save()
+        save_callsign(callsign)
 
 
-def update_position_entry(position: Positions, message: SBSMessage, distance: float, bearing: float) -> Positions:
+def update_position_entry(position: Positions, callsign: Callsigns, message: SBSMessage, distance: float,
+                          bearing: float) -> Positions:
     try:
         position.hex_ident = message.hex_ident
         position.latitude = message.latitude
@@ -266,8 +570,6 @@ def update_position_entry(position: Positions, message: SBSMessage, distance: fl
         position.num_message = position.num_message + 1
         position.message_received = datetime.datetime.now()
 
-        position.save()
-
         return position
 
     except ValueError:
@@ -288,68 +590,107 @@ def create_position_entry(callsign: Callsigns, message: SBSMessage, distance: fl
             message_generated=message.get_generated_datetime(),
             num_message=num
         )
-        position.save()
+        database_spool.save(position, {"callsign_id": callsign})
         return position
 
     except ValueError:
         pass
 
 
-def calculate_distance(plane_position_in_radians: (float, float), observer_position: (float, float)) -> float:
-    f0 = cos(observer_position[0])  # local conversion for spherical coordinates
-    distance = round(R0 * sqrt((plane_position_in_radians[0] - observer_position[0]) ** 2 + f0 ** 2 * (
-            plane_position_in_radians[1] - observer_position[1]) ** 2), 2)
-    return distance
-
-
-def calculate_bearing(plane_position_in_radians: (float, float), observer_position: (float, float)) -> float:
-    delta_lat = plane_position_in_radians[0] - observer_position[0]
-    delta_lon = plane_position_in_radians[1] - observer_position[1]
-    f0 = math.cos(observer_position[0])
+def measure_positions(messages: list[SBSMessage]) -> list[tuple | None]:
+    """
+    Computes the distances and bearings of all position messages of the batch to all observers as one matrix.
+    Returns the row of every message, None for messages without a position.
+    """
+    indices, latitudes, longitudes = [], [], []
+    for index, message in enumerate(messages):
+        if message.message_type == "MSG" and message.transmission_type == "3":
+            try:
+                latitude, longitude = float(message.latitude), float(message.longitude)
+            except ValueError:
+                continue
+            indices.append(index)
+            latitudes.append(latitude)
+            longitudes.append(longitude)
 
-    bearing_rad = math.atan2(delta_lon * f0, delta_lat)
-    return bearing_rad
+    measurements = [None] * len(messages)
+    if indices:
+        distances, bearings = observer_tracker.measure(latitudes, longitudes)
+        for row, index in enumerate(indices):
+            measurements[index] = (distances[row], bearings[row])
+    return measurements
 
 
 def get_observer_location_in_degrees() -> (float, float):
-    latitude = float(os.getenv('LATITUDE', 50.036))
-    longitude = float(os.getenv('LONGITUDE', 8.553))
-    return radians(latitude), radians(longitude)
+    """Returns the position of the primary observer in radians."""
+    primary_observer = observer_tracker.observers[0]
+    return primary_observer.latitude, primary_observer.longitude
 
 
-def is_plane_closer(hex_ident: str, distance: float) -> bool:
-    global closest_aircraft
-    if closest_aircraft is None or closest_aircraft.hex_ident == hex_ident:
-        return True
-    if distance < closest_aircraft.distance or is_last_message_too_old(closest_aircraft):
-        return True
-    return False
+def refresh_aircraft_expiry(hex_ident: str):
+    expiry_wheel.schedule(("aircraft", hex_ident), MAX_TIME_WITHOUT_MESSAGE_IN_MIN * 60)
 
 
-def is_plane_closer_low_alt(hex_ident: str, distance: float, altitude: int) -> bool:
-    global closest_aircraft_low_alt
-    if closest_aircraft_low_alt is None or closest_aircraft_low_alt.hex_ident == hex_ident:
-        return True
-    if (distance_adjusted_by_altitude_penalty(distance, altitude) < distance_adjusted_by_altitude_penalty(
-            closest_aircraft_low_alt.distance, int(closest_aircraft_low_alt.altitude))
-            or is_last_message_too_old(closest_aircraft_low_alt)):
-        return True
-    return False
+def expire_stale_aircraft() -> bool:
+    """Evicts all aircraft whose expiry time has passed. Returns True if a closest plane was dropped."""
+    changed = False
+    for kind, hex_ident in expiry_wheel.advance():
+        if kind == "aircraft":
+            changed = clear_closest_aircraft(hex_ident) or changed
+            changed = observer_tracker.remove(hex_ident) or changed
+            events = spatial_index.remove(hex_ident)
+            record_geofence_events(events, None)
+            changed = bool(events) or changed
+            cpa_predictor.remove(hex_ident)
+            flush_callsign(hex_ident)
+        elif kind == "callsign":
+            remove_callsign_from_list(hex_ident)
+    return changed
 
 
-def is_last_message_too_old(closest: Positions):
-    if closest.message_received is None:
-        return True
-    return closest.message_received < datetime.datetime.now() - datetime.timedelta(
-        minutes=MAX_TIME_WITHOUT_MESSAGE_IN_MIN)
+def clear_closest_aircraft(hex_ident: str) -> bool:
+    global closest_aircraft, closest_aircraft_low_alt, closest_aircraft_callsign, closest_aircraft_low_alt_callsign
+    changed = False
+    if closest_aircraft is not None and closest_aircraft.hex_ident == hex_ident:
+        closest_aircraft = None
+        closest_aircraft_callsign = None
+        changed = True
+    if closest_aircraft_low_alt is not None and closest_aircraft_low_alt.hex_ident == hex_ident:
+        closest_aircraft_low_alt = None
+        closest_aircraft_low_alt_callsign = None
+        changed = True
+    return changed
+
+
+def dead_reckon_position(position: Positions | None) -> Positions | None:
+    """
+    Returns the position moved along the last known velocity of the plane, as an unsaved copy for display and
+    broadcast. Positions are only dead-reckoned where the predictor is kept, in multi-process mode when the snapshot
+    is written.
+    """
+    if position is None or cpa_predictor is None:
+        return position
+    reckoned = cpa_predictor.dead_reckon(position.hex_ident)
+    if reckoned is None:
+        return position
+    distance, bearing, altitude = reckoned
+    return Positions(hex_ident=position.hex_ident, callsign_id=position.callsign_id, altitude=round(altitude),
+                     distance=distance, bearing=bearing, message_received=position.message_received,
+                     num_message=position.num_message)
 
 
-def distance_adjusted_by_altitude_penalty(distance: float, altitude: int) -> float:
-    return distance if altitude < PREF_ALT_LIMIT_IN_FEET else distance + HIGH_ALT_DIST_PENALTY_IN_KM
+def flush_callsign(hex_ident: str):
+    global callsigns
+    for callsign in callsigns:
+        if callsign.hex_ident == hex_ident:
+            flush_position(callsign)
+            save_callsign(callsign)
 
 
 def clear_screen():
     global device
+    if device is None:
+        return
     device.clear()
     device.show()
 
@@ -377,19 +718,21 @@ def show_on_screen(screentime_in_seconds: int, keepon: bool, low_alt_prio_switch
 def display_closest_aircraft(keepon: bool, low_alt_prio_switch_state: bool):
     global closest_aircraft, closest_aircraft_low_alt, closest_aircraft_callsign, closest_aircraft_low_alt_callsign
 
-    if low_alt_prio_switch_state == GPIO.LOW:
+    if low_alt_prio_switch_state == SWITCH_LOW:
         closest = closest_aircraft_low_alt
         callsign = closest_aircraft_low_alt_callsign
     else:
         closest = closest_aircraft
         callsign = closest_aircraft_callsign
     if closest is None or callsign is None:
+        clear_screen()
         return
-    write_on_screen(callsign, closest, keepon, low_alt_prio_switch_state)
+    write_on_screen(callsign, dead_reckon_position(closest), keepon, low_alt_prio_switch_state)
 
 
 def write_on_screen(callsign: Callsigns, position: Positions, keepon: bool, low_alt_prio_switch_state):
     global device
+    from PIL import ImageDraw, Image
 
     font_normal = make_font("DejaVuSansMono.ttf", 10)
     font_bold = make_font("DejaVuSansMono-Bold.ttf", 12)
@@ -410,7 +753,7 @@ def write_on_screen(callsign: Callsigns, position: Positions, keepon: bool, low_
         draw.text((15, 50), f"{message_timestamp} ({position.num_message})", font=font_normal, fill="white")
     draw_small_compass(draw, 110, 40, position.bearing)
 
-    if low_alt_prio_switch_state == GPIO.LOW:
+    if low_alt_prio_switch_state == SWITCH_LOW:
         draw.text((105, 50), "\uf06e", font=awesome_font, fill="white")
 
     device.display(image)
@@ -475,6 +818,8 @@ def to_string_with_leading_zero(number: int) -> str:
 
 
 def read_switch_input(gpio_pin: int) -> bool:
+    if GPIO is None:
+        return HEADLESS_SWITCH_STATES[gpio_pin]
     if ENVIRONMENT == "development":
         if gpio_pin == SCREEN_SWITCH_PIN:
             return DEV_SCREEN_SWITCH_STATE
@@ -489,63 +834,136 @@ def read_switch_input(gpio_pin: int) -> bool:
         except Exception as e:
             print(f"GPIO error: {e}")
             traceback.print_exc()
-            return GPIO.LOW
+            return SWITCH_LOW
 
 
 def turn_only_yellow_led_on():
+    if GPIO is None:
+        return
     GPIO.output(LED_YELLOW_PIN, True)
     GPIO.output(LED_GREEN_PIN, False)
 
 
 def turn_only_green_led_on():
+    if GPIO is None:
+        return
     GPIO.output(LED_YELLOW_PIN, False)
     GPIO.output(LED_GREEN_PIN, True)
 
 
 def turn_off_all_led():
+    if GPIO is None:
+        return
     GPIO.output(LED_YELLOW_PIN, False)
     GPIO.output(LED_GREEN_PIN, False)
 
 
 def broadcast_closest_plane():
     global closest_aircraft, closest_aircraft_low_alt, closest_aircraft_callsign, closest_aircraft_low_alt_callsign
-    if (closest_aircraft is None
-            or closest_aircraft_low_alt is None
-            or closest_aircraft_callsign is None
-            or closest_aircraft_low_alt_callsign is None):
+    global has_broadcast
+    # Empty slots are sent as well once something was broadcast, so the page drops planes that expired.
+    if (not has_broadcast and closest_aircraft is None and closest_aircraft_low_alt is None
+            and closest_aircraft_callsign is None and closest_aircraft_low_alt_callsign is None
+            and observer_tracker.is_empty() and not geofence_events):
         return
+    has_broadcast = True
+
+    data = {}
+    data.update(create_broadcast_data(dead_reckon_position(closest_aircraft), closest_aircraft_callsign, ""))
+    data.update(create_broadcast_data(dead_reckon_position(closest_aircraft_low_alt), closest_aircraft_low_alt_callsign,
+                                      "_low"))
+    data["approaching"] = [create_approaching_data(approach) for approach in approaching_aircraft]
+    data["observers"] = [create_observer_data(index) for index in range(len(observer_tracker))]
+    data["zones"] = [{"name": zone.name, "aircraft": count} for zone, count in zip(spatial_index.zones,
+                                                                                   get_zone_occupancy())]
+    data["geofence_events"] = [create_geofence_event_data(*event) for event in geofence_events]
+    data["database_spool"] = get_database_spool_stats()
+    send_data_to_server(data)
 
-    position: Positions = closest_aircraft
-    position_low: Positions = closest_aircraft_low_alt
-    callsign: Callsigns = closest_aircraft_callsign
-    callsign_low: Callsigns = closest_aircraft_low_alt_callsign
-    bearing_deg = round(math.degrees(position.bearing) % 360, 2)
-    bearing_deg_low = round(math.degrees(position_low.bearing) % 360, 2)
-    bearing_text = to_string_with_leading_zero(int(bearing_deg))
-    bearing_text_low = to_string_with_leading_zero(int(bearing_deg_low))
-
-    data = {
-        "callsign": callsign.callsign,
-        "callsign_low": callsign_low.callsign,
-        "registration": callsign.registration if callsign.registration else "-",
-        "registration_low": callsign_low.registration if callsign_low.registration else "-",
-        "altitude": f"{position.altitude} ft" if position.altitude else "-",
-        "altitude_low": f"{position_low.altitude} ft" if position_low.altitude else "-",
-        "distance": f"{position.distance} km" if position.distance else "-",
-        "distance_low": f"{position_low.distance} km" if position_low.distance else "-",
-        "type": callsign.typecode if callsign.typecode else "-",
-        "type_low": callsign_low.typecode if callsign_low.typecode else "-",
-        "bearing": bearing_text,
-        "bearing_low": bearing_text_low,
-        "timestamp": position.message_received.strftime("%H:%M:%S") if position.message_received else "-",
-        "timestamp_low": position_low.message_received.strftime("%H:%M:%S") if position_low.message_received else "-",
-        "message_num": position.num_message,
-        "message_num_low": position_low.num_message,
+
+def create_broadcast_data(position: Positions | None, callsign: Callsigns | None, suffix: str) -> dict:
+    if position is None or callsign is None:
+        # The plane has expired, so the slot is broadcast as empty.
+        data = {key: "-" for key in ["callsign", "registration", "altitude", "distance", "type", "bearing",
+                                      "timestamp", "message_num"]}
+    else:
+        bearing_deg = round(math.degrees(position.bearing) % 360, 2)
+        data = {
+            "callsign": callsign.callsign,
+            "registration": callsign.registration if callsign.registration else "-",
+            "altitude": f"{position.altitude} ft" if position.altitude else "-",
+            "distance": f"{position.distance} km" if position.distance else "-",
+            "type": callsign.typecode if callsign.typecode else "-",
+            "bearing": to_string_with_leading_zero(int(bearing_deg)),
+            "timestamp": position.message_received.strftime("%H:%M:%S") if position.message_received else "-",
+            "message_num": position.num_message,
+        }
+    return {f"{key}{suffix}": value for key, value in data.items()}
+
+
+def create_observer_data(index: int) -> dict:
+    data = {"name": observer_tracker.observers[index].name}
+    for kind, suffix in [(CLOSEST, ""), (CLOSEST_LOW_ALT, "_low")]:
+        closest = observer_tracker.get_closest(index, kind)
+        if closest is None:
+            data.update({f"{key}{suffix}": "-" for key in ["callsign", "altitude", "distance", "bearing"]})
+            continue
+        callsign, distance, bearing, altitude = closest
+        data.update({
+            f"callsign{suffix}": callsign.callsign,
+            f"altitude{suffix}": f"{altitude} ft",
+            f"distance{suffix}": f"{distance} km",
+            f"bearing{suffix}": to_string_with_leading_zero(int(round(math.degrees(bearing) % 360, 2))),
+        })
+    return data
+
+
+def create_geofence_event_data(event: GeofenceEvent, callsign: str, received: datetime.datetime) -> dict:
+    return {
+        "zone": event.zone,
+        "callsign": callsign,
+        "event": "enter" if event.entered else "exit",
+        "altitude": f"{event.altitude} ft",
+        "timestamp": received.strftime("%H:%M:%S"),
+    }
+
+
+def get_zone_occupancy() -> list[int]:
+    if zone_occupancy is not None:
+        return zone_occupancy
+    return spatial_index.occupancy
+
+
+def get_database_spool_stats() -> dict | None:
+    if database_spool is not None:
+        return database_spool.get_stats()
+    return database_spool_stats
+
+
+def create_approaching_data(approach: ClosestApproach) -> dict:
+    global callsigns
+    callsign = next((c for c in reversed(callsigns) if c.hex_ident == approach.hex_ident), None)
+    minutes, seconds = divmod(int(approach.time_to_closest), 60)
+    return {
+        "callsign": callsign.callsign if callsign is not None else approach.hex_ident,
+        "distance": f"{round(approach.current_distance, 2)} km",
+        "closest_distance": f"{round(approach.closest_distance, 2)} km",
+        "time_to_closest": f"{minutes}:{seconds:02d}",
+        "altitude": f"{int(approach.altitude)} ft",
     }
-    send_data_to_server(data)
 
 
 def send_data_to_server(data):
+    global update_channel
+    if BROADCAST_SOCKET_PATH:
+        # The channel is opened by the process that broadcasts, it is not shared with forked workers.
+        if update_channel is None:
+            update_channel = UpdateChannel(BROADCAST_SOCKET_PATH)
+        if update_channel.send(data):
+            return
+
+    import requests
+
     try:
         with concurrent.futures.ThreadPoolExecutor() as executor:
             executor.submit(create_post_request, data)
@@ -554,72 +972,410 @@ def send_data_to_server(data):
 
 
 def create_post_request(data):
+    import requests
+
     requests.post(BROADCAST_ENDPOINT_URL, json=data)
 
 
 def update_screen_if_status_changed(screen_switch_state: bool, screentime_in_seconds: int, keepon: bool):
     global was_screen_on
-    if was_screen_on and screen_switch_state != GPIO.HIGH:
+    if was_screen_on and screen_switch_state != SWITCH_HIGH:
         clear_screen()
         was_screen_on = False
-    elif not was_screen_on and screen_switch_state == GPIO.HIGH:
+    elif not was_screen_on and screen_switch_state == SWITCH_HIGH:
         was_screen_on = True
         low_alt_prio_switch_state = read_switch_input(LOW_ALT_PRIO_SWITCH_PIN)
         show_on_screen(screentime_in_seconds, keepon, low_alt_prio_switch_state)
 
 
-def process_planedata(download_file: bool, screentime: int, keepon: bool, broadcast: bool):
+def create_feed_reader(feed: str, connection: socket.socket, aircraft_data: dict):
+    if feed == "beast":
+        observer_position = get_observer_location_in_degrees()
+        return BeastFeedReader(connection, aircraft_data,
+                               (math.degrees(observer_position[0]), math.degrees(observer_position[1])))
+    return SBSFeedReader(connection, aircraft_data)
+
+
+def get_feed_port(feed: str) -> int:
+    if feed == "beast":
+        return int(os.getenv("1090_BEAST_PORT", 30005))
+    return int(os.getenv("1090_PORT"))
+
+
+def handle_message(message: SBSMessage, measurement: tuple | None = None) -> bool:
+    """Handles a single message. Returns True if one of the closest planes changed."""
+    if message.message_type != "MSG":
+        return False
+    if message.transmission_type in AIRCRAFT_EXPIRY_TRANSMISSION_TYPES:
+        refresh_aircraft_expiry(message.hex_ident)
+    if message.transmission_type == '1':
+        turn_only_yellow_led_on()
+        handle_transmission_type_1(message)
+    elif message.transmission_type == '3':
+        turn_only_yellow_led_on()
+        geofence_changed = handle_geofences(message)
+        return bool(handle_transmission_type_3(message, measurement)) or geofence_changed
+    elif message.transmission_type == '4':
+        handle_transmission_type_4(message)
+    return False
+
+
+def process_messages(messages: list[SBSMessage]) -> bool:
+    """Expires stale aircraft and handles the messages. Returns True if one of the closest planes changed."""
+    database_spool.drain_if_due()
+    changed = expire_stale_aircraft()
+    for message, measurement in zip(messages, measure_positions(messages)):
+        changed = handle_message(message, measurement) or changed
+    if time.monotonic() - last_position_write_report >= POSITION_WRITE_REPORT_INTERVAL_IN_SECONDS:
+        report_position_writes()
+    if time.monotonic() - last_callsign_counter_flush >= CALLSIGN_COUNTER_FLUSH_INTERVAL_IN_SECONDS:
+        flush_callsign_counters()
+    return changed
+
+
+def update_low_alt_prio_switch_state(low_alt_prio_switch_state: bool) -> bool:
     global last_low_alt_prio_switch_state
+    if last_low_alt_prio_switch_state != low_alt_prio_switch_state:
+        last_low_alt_prio_switch_state = low_alt_prio_switch_state
+        return True
+    return False
+
+
+def publish_closest_plane(screen_switch_state: bool, screentime: int, keepon: bool, broadcast: bool,
+                          low_alt_prio_switch_state: bool):
+    if broadcast:
+        broadcast_closest_plane()
+    if screen_switch_state == SWITCH_HIGH:
+        show_on_screen(screentime, keepon, low_alt_prio_switch_state)
+
+
+def process_messages_in_single_process(screentime: int, keepon: bool, broadcast: bool, messages: list[SBSMessage]):
+    screen_switch_state = read_switch_input(SCREEN_SWITCH_PIN)
+    update_screen_if_status_changed(screen_switch_state, screentime, keepon)
+    changed = process_messages(messages)
+    low_alt_prio_switch_state = read_switch_input(LOW_ALT_PRIO_SWITCH_PIN)
+    changed = update_low_alt_prio_switch_state(low_alt_prio_switch_state) or changed
+    approaching_changed = update_approaching_aircraft()
+    if changed:
+        publish_closest_plane(screen_switch_state, screentime, keepon, broadcast, low_alt_prio_switch_state)
+    elif approaching_changed and broadcast:
+        broadcast_closest_plane()
+
+
+def to_record_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        return MISSING_RECORD_INT
+
+
+def to_record_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return math.nan
+
+
+def from_record_number(value) -> str:
+    if value == MISSING_RECORD_INT or value != value:  # NaN is the only value not equal to itself.
+        return ""
+    return str(value)
+
+
+def message_to_feed_record(message: SBSMessage) -> tuple:
+    try:
+        generated = message.get_generated_datetime().timestamp()
+    except ValueError:
+        generated = math.nan
+    return (
+        to_record_int(message.transmission_type) & 0xFF,
+        message.hex_ident.encode(),
+        message.callsign.encode(),
+        to_record_int(message.altitude),
+        to_record_float(message.latitude),
+        to_record_float(message.longitude),
+        to_record_float(message.ground_speed),
+        to_record_float(message.track),
+        to_record_float(message.vertical_rate),
+        generated
+    )
+
+
+def feed_record_to_message(record: tuple, aircraft_data: dict) -> SBSMessage:
+    (transmission_type, hex_ident, callsign, altitude, latitude, longitude, ground_speed, track, vertical_rate,
+     generated) = record
+    return SBSMessage.from_values(
+        aircraft_data,
+        str(transmission_type),
+        hex_ident.rstrip(b"\0").decode(),
+        datetime.datetime.fromtimestamp(generated) if generated == generated else datetime.datetime.now(),
+        callsign=callsign.rstrip(b"\0").decode(),
+        altitude=from_record_number(altitude),
+        latitude=from_record_number(latitude),
+        longitude=from_record_number(longitude),
+        ground_speed=from_record_number(ground_speed),
+        track=from_record_number(track),
+        vertical_rate=from_record_number(vertical_rate)
+    )
+
+
+def write_feed_records(feed_ring: SharedRingBuffer, messages: list[SBSMessage]):
+    for message in messages:
+        if message.message_type == "MSG":
+            feed_ring.write(*message_to_feed_record(message))
+
+
+def pack_closest_slot(position: Positions | None, callsign: Callsigns | None) -> tuple:
+    if position is None or callsign is None:
+        return False, b"", b"", b"", 0, 0.0, 0.0, 0.0, 0
+    return (
+        True,
+        callsign.callsign.encode(),
+        (callsign.registration or "").encode(),
+        (callsign.typecode or "").encode(),
+        int(position.altitude) if position.altitude else 0,
+        float(position.distance or 0),
+        float(position.bearing or 0),
+        position.message_received.timestamp() if position.message_received else 0.0,
+        position.num_message
+    )
+
+
+def unpack_closest_slot(values: tuple) -> (Positions | None, Callsigns | None):
+    present, callsign, registration, typecode, altitude, distance, bearing, message_received, num_message = values
+    if not present:
+        return None, None
+    # Unsaved models, they only carry the values needed for display and broadcast.
+    callsign = Callsigns(callsign=callsign.rstrip(b"\0").decode(), registration=registration.rstrip(b"\0").decode(),
+                         typecode=typecode.rstrip(b"\0").decode())
+    position = Positions(altitude=altitude, distance=distance, bearing=bearing, num_message=num_message,
+                         message_received=datetime.datetime.fromtimestamp(message_received)
+                         if message_received else None)
+    return position, callsign
+
+
+def create_closest_snapshot() -> tuple:
+    global closest_aircraft, closest_aircraft_low_alt, closest_aircraft_callsign, closest_aircraft_low_alt_callsign
+    values = pack_closest_slot(dead_reckon_position(closest_aircraft), closest_aircraft_callsign)
+    values += pack_closest_slot(dead_reckon_position(closest_aircraft_low_alt), closest_aircraft_low_alt_callsign)
+    for i in range(APPROACHING_LIST_MAX_LEN):
+        if i < len(approaching_aircraft):
+            approach = approaching_aircraft[i]
+            values += (True, create_approaching_data(approach)["callsign"].encode(), approach.current_distance,
+                       approach.closest_distance, approach.time_to_closest, approach.altitude)
+        else:
+            values += (False, b"", 0.0, 0.0, 0.0, 0.0)
+    for index in range(len(observer_tracker)):
+        for kind in [CLOSEST, CLOSEST_LOW_ALT]:
+            closest = observer_tracker.get_closest(index, kind)
+            if closest is None:
+                values += (False, b"", 0.0, 0.0, 0)
+            else:
+                callsign, distance, bearing, altitude = closest
+                values += (True, callsign.callsign.encode(), distance, bearing, altitude)
+    for i in range(GEOFENCE_EVENTS_LIST_MAX_LEN):
+        if i < len(geofence_events):
+            event, callsign, received = geofence_events[i]
+            values += (True, event.zone_index, callsign.encode(), event.entered, received.timestamp(), event.altitude)
+        else:
+            values += (False, 0, b"", False, 0.0, 0)
+    values += tuple(spatial_index.occupancy)
+    stats = database_spool.get_stats()
+    return values + (stats["database_available"], stats["size"], stats["drain_rate"])
+
+
+def apply_closest_snapshot(snapshot: tuple):
+    global closest_aircraft, closest_aircraft_low_alt, closest_aircraft_callsign, closest_aircraft_low_alt_callsign
+    global approaching_aircraft, database_spool_stats, zone_occupancy
+    closest_aircraft, closest_aircraft_callsign = unpack_closest_slot(snapshot[:CLOSEST_SLOT_FIELDS])
+    closest_aircraft_low_alt, closest_aircraft_low_alt_callsign = unpack_closest_slot(
+        snapshot[CLOSEST_SLOT_FIELDS:2 * CLOSEST_SLOT_FIELDS])
+    approaching_aircraft = []
+    offset = 2 * CLOSEST_SLOT_FIELDS
+    for i in range(APPROACHING_LIST_MAX_LEN):
+        present, name, current_distance, closest_distance, time_to_closest, altitude = snapshot[
+            offset + i * APPROACHING_SLOT_FIELDS:offset + (i + 1) * APPROACHING_SLOT_FIELDS]
+        if present:
+            # The callsign list is not shared with the workers, so the resolved name takes the place of the hex_ident.
+            approaching_aircraft.append(ClosestApproach(name.rstrip(b"\0").decode(), time_to_closest,
+                                                        closest_distance, current_distance, altitude))
+    offset += APPROACHING_LIST_MAX_LEN * APPROACHING_SLOT_FIELDS
+    for index in range(len(observer_tracker)):
+        for kind in [CLOSEST, CLOSEST_LOW_ALT]:
+            present, name, distance, bearing, altitude = snapshot[offset:offset + OBSERVER_SLOT_FIELDS]
+            offset += OBSERVER_SLOT_FIELDS
+            callsign = Callsigns(callsign=name.rstrip(b"\0").decode()) if present else None
+            observer_tracker.set_closest(index, kind, callsign, distance, bearing, altitude)
+    geofence_events.clear()
+    for _ in range(GEOFENCE_EVENTS_LIST_MAX_LEN):
+        slot = snapshot[offset:offset + GEOFENCE_EVENT_SLOT_FIELDS]
+        present, zone_index, callsign, entered, received, altitude = slot
+        offset += GEOFENCE_EVENT_SLOT_FIELDS
+        if present:
+            event = GeofenceEvent(zone_index, spatial_index.zones[zone_index].name, "", entered, 0.0, 0.0, altitude)
+            geofence_events.append((event, callsign.rstrip(b"\0").decode(), datetime.datetime.fromtimestamp(received)))
+    zone_occupancy = list(snapshot[offset:offset + len(spatial_index.zones)])
+    database_available, size, drain_rate = snapshot[-3:]
+    database_spool_stats = {"size": size, "drain_rate": round(drain_rate, 1), "database_available": database_available}
+
+
+def run_worker(name: str, target, *args):
+    # Ctrl-C reaches all processes of the terminal, the workers are stopped by the stop event instead so the
+    # persistence worker can flush the pending writes.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    start_wall, start_cpu = time.monotonic(), time.process_time()
+    try:
+        target(*args)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error in {name} worker: {e}")
+        traceback.print_exc()
+    finally:
+        wall, cpu = time.monotonic() - start_wall, time.process_time() - start_cpu
+        print(f"{name} worker stopped: {cpu:.1f} s CPU in {wall:.1f} s ({cpu / max(wall, 1e-9):.0%} of one core).")
+
+
+def run_persistence_worker(feed_reader: RingReader, snapshot_ring: SharedRingBuffer, aircraft_data: dict,
+                           stop_event):
+    global database_spool
+    database_spool = DatabaseSpool(DATABASE_SPOOL_PATH)
+    while True:
+        records, lost = feed_reader.read()
+        if lost:
+            print(f"Warning: Persistence worker fell behind, {lost} messages lost.")
+        changed = process_messages([feed_record_to_message(record, aircraft_data) for record in records])
+        if update_approaching_aircraft() or changed:
+            snapshot_ring.write(*create_closest_snapshot())
+        if not records:
+            if stop_event.is_set():
+                flush_all_positions()
+                flush_callsign_counters()
+                return
+            time.sleep(WORKER_POLL_INTERVAL_IN_SECONDS)
+
+
+def run_broadcast_worker(snapshot_reader: RingReader, stop_event):
+    while True:
+        snapshots, _ = snapshot_reader.read()
+        if snapshots:
+            # Only the latest state is of interest, older snapshots are skipped.
+            apply_closest_snapshot(snapshots[-1])
+            broadcast_closest_plane()
+        elif stop_event.is_set():
+            return
+        else:
+            time.sleep(WORKER_POLL_INTERVAL_IN_SECONDS)
+
+
+def run_display_worker(snapshot_reader: RingReader, screentime: int, keepon: bool, stop_event):
+    while not stop_event.is_set():
+        screen_switch_state = read_switch_input(SCREEN_SWITCH_PIN)
+        update_screen_if_status_changed(screen_switch_state, screentime, keepon)
+        snapshots, _ = snapshot_reader.read()
+        if snapshots:
+            apply_closest_snapshot(snapshots[-1])
+        low_alt_prio_switch_state = read_switch_input(LOW_ALT_PRIO_SWITCH_PIN)
+        changed = update_low_alt_prio_switch_state(low_alt_prio_switch_state) or bool(snapshots)
+        if changed and screen_switch_state == SWITCH_HIGH:
+            show_on_screen(screentime, keepon, low_alt_prio_switch_state)
+        time.sleep(WORKER_POLL_INTERVAL_IN_SECONDS)
+
+
+def start_workers(feed_ring: SharedRingBuffer, snapshot_ring: SharedRingBuffer, aircraft_data: dict, screentime: int,
+                  keepon: bool, broadcast: bool, stop_event) -> list:
+    """
+    Starts the worker processes of the multi-process mode. The workers are forked, so they inherit the loaded
+    aircraft data and the hardware setup. Every worker gets its own read cursor, created before the first record is
+    written.
+    """
+    context = multiprocessing.get_context("fork")
+    workers = [
+        context.Process(target=run_worker, name="persistence",
+                        args=("Persistence", run_persistence_worker, feed_ring.reader(), snapshot_ring, aircraft_data,
+                              stop_event))
+    ]
+    if device is not None:
+        workers.append(context.Process(target=run_worker, name="display",
+                                       args=("Display", run_display_worker, snapshot_ring.reader(), screentime, keepon,
+                                             stop_event)))
+    if broadcast:
+        workers.append(context.Process(target=run_worker, name="broadcast",
+                                       args=("Broadcast", run_broadcast_worker, snapshot_ring.reader(), stop_event)))
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def stop_workers(workers: list, stop_event):
+    stop_event.set()
+    for worker in workers:
+        worker.join(timeout=10)
+        if worker.is_alive():
+            worker.terminate()
+
+
+def read_feed(feed: str, aircraft_data: dict, process_batch):
+    """Reads the dump1090 feed and passes the messages to process_batch, at least once per expiry tick."""
+    host = os.getenv("1090_HOST")
+    port = get_feed_port(feed)
+
+    while True:
+        missing_messages = 0
+        try:
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+                s.connect((host, port))
+                # The timeout lets the loop expire stale aircraft even if no messages arrive.
+                s.settimeout(EXPIRY_TICK_IN_SECONDS)
+                feed_reader = create_feed_reader(feed, s, aircraft_data)
+                while True:
+                    turn_only_green_led_on()
+                    messages = feed_reader.read_messages()
+                    if messages is None:
+                        missing_messages += 1
+                        if missing_messages >= MAX_MESSAGE_READ_RETRIES:
+                            print("Connection lost. Restarting connection...")
+                            break
+                        print(
+                            f"Warning: No data received. Retrying (attempt {missing_messages}"
+                            f"/{MAX_MESSAGE_READ_RETRIES})...")
+                        continue
+
+                    missing_messages = 0
+                    process_batch(messages)
+
+        except (socket.error, ConnectionError) as conn_error:
+            print(f"Socket error: {conn_error}. Retrying in 2 seconds...")
+            time.sleep(1)
+
+
+def process_planedata(download_file: bool, screentime: int, keepon: bool, broadcast: bool, feed: str,
+                      multiprocess: bool, headless: bool):
+    global cpa_predictor, database_spool
+    rings: list[SharedRingBuffer] = []
+    workers = []
+    stop_event = multiprocessing.get_context("fork").Event()
     try:
+        init_tracking()
+        if not headless:
+            init_gpio()
+            init_display()
+        cpa_predictor = CPAPredictor(get_observer_location_in_degrees())
         turn_only_yellow_led_on()
         aircraft_data = get_aircraft_data(download_file)
 
         print("Aircraft data loaded.")
 
-        host = os.getenv("1090_HOST")
-        port = int(os.getenv("1090_PORT"))
-
-        while True:
-            missing_messages = 0
-            try:
-                with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-                    s.connect((host, port))
-                    with s.makefile() as f:
-                        while True:
-                            turn_only_green_led_on()
-                            screen_switch_state = read_switch_input(SCREEN_SWITCH_PIN)
-                            update_screen_if_status_changed(screen_switch_state, screentime, keepon)
-                            raw_message = f.readline()
-                            if not raw_message:
-                                missing_messages += 1
-                                if missing_messages >= MAX_MESSAGE_READ_RETRIES:
-                                    print("Connection lost. Restarting connection...")
-                                    break
-                                print(
-                                    f"Warning: No data received. Retrying (attempt {missing_messages}"
-                                    f"/{MAX_MESSAGE_READ_RETRIES})...")
-                                continue
-
-                            missing_messages = 0
-                            message = SBSMessage(raw_message, aircraft_data)
-                            if message.message_type == "MSG" and message.transmission_type == '1':
-                                turn_only_yellow_led_on()
-                                handle_transmission_type_1(message)
-                            elif message.message_type == "MSG" and message.transmission_type == '3':
-                                turn_only_yellow_led_on()
-                                changed = handle_transmission_type_3(message)
-                                low_alt_prio_switch_state = read_switch_input(LOW_ALT_PRIO_SWITCH_PIN)
-                                if last_low_alt_prio_switch_state != low_alt_prio_switch_state:
-                                    last_low_alt_prio_switch_state = low_alt_prio_switch_state
-                                    changed = True
-                                if changed and broadcast:
-                                    broadcast_closest_plane()
-                                if changed and screen_switch_state == GPIO.HIGH:
-                                    show_on_screen(screentime, keepon, low_alt_prio_switch_state)
-
-            except (socket.error, ConnectionError) as conn_error:
-                print(f"Socket error: {conn_error}. Retrying in 2 seconds...")
-                time.sleep(1)
+        if multiprocess:
+            feed_ring = SharedRingBuffer(FEED_RECORD, FEED_RING_CAPACITY)
+            snapshot_ring = SharedRingBuffer(snapshot_record, SNAPSHOT_RING_CAPACITY)
+            rings = [feed_ring, snapshot_ring]
+            workers = start_workers(feed_ring, snapshot_ring, aircraft_data, screentime, keepon, broadcast,
+                                    stop_event)
+            read_feed(feed, aircraft_data, partial(write_feed_records, feed_ring))
+        else:
+            database_spool = DatabaseSpool(DATABASE_SPOOL_PATH)
+            read_feed(feed, aircraft_data, partial(process_messages_in_single_process, screentime, keepon, broadcast))
 
     except KeyboardInterrupt:
         print("User interrupted execution.")
@@ -628,9 +1384,16 @@ def process_planedata(download_file: bool, screentime: int, keepon: bool, broadc
         print(f"Error: {e}")
         traceback.print_exc()
     finally:
+        stop_workers(workers, stop_event)
+        if database_spool is not None:
+            flush_all_positions()
+            flush_callsign_counters()
+        for ring in rings:
+            ring.close()
         clear_screen()
         turn_off_all_led()
-        GPIO.cleanup()
+        if GPIO is not None:
+            GPIO.cleanup()
 
 
 if __name__ == "__main__":
@@ -659,6 +1422,24 @@ if __name__ == "__main__":
         help="Set the wait time in seconds between screen refreshs. Can also be set to 0 for immediate refresh ("
              "default: 2)."
     )
+    parser.add_argument(
+        "-f", "--feed",
+        choices=["sbs", "beast"],
+        default="sbs",
+        help="Read the BaseStation text feed (1090_PORT) or the Beast binary feed (1090_BEAST_PORT) of dump1090 "
+             "(default: sbs)."
+    )
+    parser.add_argument(
+        "-m", "--multiprocess",
+        action="store_true",
+        help="Run persistence, broadcast and display in separate processes fed by a shared-memory ring buffer."
+    )
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="Run without screen, switches and LEDs, e.g. on a server. Only persists and broadcasts the data."
+    )
 
     args = parser.parse_args()
-    process_planedata(args.download, args.screentime, args.keepon, args.broadcast)
+    process_planedata(args.download, args.screentime, args.keepon, args.broadcast, args.feed, args.multiprocess,
+                      args.headless)
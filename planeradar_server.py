@@ -1,9 +1,36 @@
+import argparse
+import asyncio
 import json
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
-app = FastAPI()
+from update_channel import SUBSCRIBE_FRAME, encode_frame
+from update_hub import UpdateHub, read_frame
+
+load_dotenv()
+
+UPDATE_SOCKET_PATH = os.getenv("BROADCAST_SOCKET_PATH", "/tmp/planeradar.sock")
+HUB_RECONNECT_INTERVAL_IN_SECONDS = 1
+
+hub = UpdateHub(UPDATE_SOCKET_PATH)
+hub_connection: asyncio.StreamWriter | None = None  # subscription of this worker, also used to publish updates
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """Keeps the worker subscribed to the update hub while the server is running."""
+    subscription = asyncio.create_task(subscribe_to_hub())
+    yield
+    subscription.cancel()
+    await hub.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Serve static files (HTML, JS, etc.)
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -23,16 +50,54 @@ class ConnectionManager:
         await websocket.send_text(json.dumps(latest_data))  # Send initial data
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        self.active_connections.discard(websocket)
 
     async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_text(json.dumps(message))
+        await self.broadcast_text(json.dumps(message))
+
+    async def broadcast_text(self, text: str):
+        for connection in list(self.active_connections):
+            try:
+                await connection.send_text(text)
+            except Exception:
+                self.disconnect(connection)  # closed before its disconnect was received.
 
 
 manager = ConnectionManager()
 
 
+async def subscribe_to_hub():
+    """
+    Receives the updates published by the data processor and all workers from the hub and passes them on to the
+    WebSocket clients of this worker. Starts the hub first if no other worker runs it.
+    """
+    global hub_connection
+    while True:
+        await hub.start()
+        try:
+            reader, writer = await asyncio.open_unix_connection(UPDATE_SOCKET_PATH)
+        except OSError:
+            await asyncio.sleep(HUB_RECONNECT_INTERVAL_IN_SECONDS)  # the hub is just being started by another worker.
+            continue
+        writer.write(SUBSCRIBE_FRAME)
+        hub_connection = writer
+        try:
+            while (payload := await read_frame(reader)) is not None:
+                await apply_update(payload.decode())
+        except (OSError, ValueError) as e:
+            print(f"Update hub connection lost ({e}).")
+        finally:
+            hub_connection = None
+            writer.close()
+
+
+async def apply_update(text: str):
+    """Keeps the update as the latest data and sends it to all WebSocket clients unchanged."""
+    global latest_data
+    latest_data = json.loads(text)
+    await manager.broadcast_text(text)
+
+
 @app.get("/")
 async def get_home():
     """Serve the HTML page."""
@@ -54,13 +119,40 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.post("/update")
 async def update_data(data: dict):
     """Receive new data via REST API and broadcast to all WebSocket clients."""
-    global latest_data
-    latest_data = data
-    await manager.broadcast(latest_data)
+    if hub_connection is not None:
+        hub_connection.write(encode_frame(data))  # the hub returns it to all workers, including this one.
+    else:
+        await apply_update(json.dumps(data))
     return {"message": "Data updated"}
 
 
+@app.get("/observers")
+async def get_observers():
+    """Return the closest planes of all observers."""
+    return latest_data.get("observers", [])
+
+
+@app.get("/observers/{name}")
+async def get_observer(name: str):
+    """Return the closest planes of a single observer."""
+    for observer in latest_data.get("observers", []):
+        if observer["name"] == name:
+            return observer
+    raise HTTPException(status_code=404, detail=f"Unknown observer: {name}")
+
+
+@app.get("/geofences")
+async def get_geofences():
+    """Return the number of planes in every geofence zone and the latest enter and exit events."""
+    return {"zones": latest_data.get("zones", []), "events": latest_data.get("geofence_events", [])}
+
+
 # Run the server
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+
+    parser = argparse.ArgumentParser(description="Publishes the data of the planeradar data processor.")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Number of worker processes (default: 1).")
+    parser.add_argument("-p", "--port", type=int, default=8000, help="Port of the server (default: 8000).")
+    args = parser.parse_args()
+    uvicorn.run("planeradar_server:app", host="0.0.0.0", port=args.port, workers=args.workers)
@@ -0,0 +1,74 @@
+import struct
+from multiprocessing import shared_memory
+
+HEADER = struct.Struct("<Q")  # number of records written so far
+SLOT_STAMP = struct.Struct("<Q")
+
+
+class SharedRingBuffer:
+    """
+    Single-producer ring buffer of fixed-size records in shared memory.
+
+    Records are packed with a fixed struct layout, so no pickling is needed between processes. Every slot carries a
+    stamp that is odd while the slot is written and even once the record is complete (seqlock). Readers use the
+    stamp to detect records that were overwritten while they were read.
+    """
+
+    def __init__(self, record_struct: struct.Struct, capacity: int):
+        self.record_struct = record_struct
+        self.capacity = capacity
+        self.slot_size = SLOT_STAMP.size + record_struct.size
+        self.memory = shared_memory.SharedMemory(create=True, size=HEADER.size + capacity * self.slot_size)
+        self.buffer = self.memory.buf
+        HEADER.pack_into(self.buffer, 0, 0)
+        self.write_sequence = 0
+
+    def write(self, *values):
+        offset = HEADER.size + (self.write_sequence % self.capacity) * self.slot_size
+        SLOT_STAMP.pack_into(self.buffer, offset, 2 * self.write_sequence + 1)
+        self.record_struct.pack_into(self.buffer, offset + SLOT_STAMP.size, *values)
+        SLOT_STAMP.pack_into(self.buffer, offset, 2 * self.write_sequence + 2)
+        self.write_sequence += 1
+        HEADER.pack_into(self.buffer, 0, self.write_sequence)
+
+    def reader(self) -> "RingReader":
+        return RingReader(self)
+
+    def close(self):
+        self.buffer = None
+        self.memory.close()
+        self.memory.unlink()
+
+
+class RingReader:
+    """Read cursor of one consumer. Consumers that fall more than one revolution behind skip the lost records."""
+
+    def __init__(self, ring: SharedRingBuffer):
+        self.ring = ring
+        self.cursor = HEADER.unpack_from(ring.buffer, 0)[0]
+        self.overruns = 0
+
+    def read(self, max_records: int = 1024) -> (list[tuple], int):
+        """Returns the records written since the last read and the number of records lost to overruns."""
+        ring = self.ring
+        head = HEADER.unpack_from(ring.buffer, 0)[0]
+        lost = 0
+        if head - self.cursor > ring.capacity:
+            lost = head - self.cursor - ring.capacity
+            self.cursor = head - ring.capacity
+
+        records = []
+        end = min(head, self.cursor + max_records)
+        while self.cursor < end:
+            offset = HEADER.size + (self.cursor % ring.capacity) * ring.slot_size
+            expected_stamp = 2 * self.cursor + 2
+            if SLOT_STAMP.unpack_from(ring.buffer, offset)[0] != expected_stamp:
+                break  # overwritten by the producer, caught by the overrun check of the next read.
+            record = ring.record_struct.unpack_from(ring.buffer, offset + SLOT_STAMP.size)
+            if SLOT_STAMP.unpack_from(ring.buffer, offset)[0] != expected_stamp:
+                break
+            records.append(record)
+            self.cursor += 1
+
+        self.overruns += lost
+        return records, lost
@@ -44,6 +44,23 @@ CREATE TABLE IF NOT EXISTS `positions` (
   CONSTRAINT `positions.callsign` FOREIGN KEY (`callsign_id`) REFERENCES `callsigns` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 
+CREATE TABLE IF NOT EXISTS `geofence_events` (
+  `id` int NOT NULL AUTO_INCREMENT,
+  `zone` varchar(50) NOT NULL,
+  `hex_ident` varchar(50) NOT NULL,
+  `callsign_id` int DEFAULT NULL,
+  `event` varchar(10) NOT NULL,
+  `latitude` float DEFAULT NULL,
+  `longitude` float DEFAULT NULL,
+  `altitude` int DEFAULT NULL,
+  `message_generated` datetime DEFAULT NULL,
+  `message_received` datetime NOT NULL DEFAULT (now()),
+  PRIMARY KEY (`id`),
+  KEY `geofence_events.zone` (`zone`, `message_received`) USING BTREE,
+  KEY `geofence_events.callsign` (`callsign_id`) USING BTREE,
+  CONSTRAINT `geofence_events.callsign` FOREIGN KEY (`callsign_id`) REFERENCES `callsigns` (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
 /*!40103 SET TIME_ZONE=IFNULL(@OLD_TIME_ZONE, 'system') */;
 /*!40101 SET SQL_MODE=IFNULL(@OLD_SQL_MODE, '') */;
 /*!40014 SET FOREIGN_KEY_CHECKS=IFNULL(@OLD_FOREIGN_KEY_CHECKS, 1) */;
@@ -18,4 +18,32 @@ ws.onmessage = function(event) {
     document.getElementById("timestamp_low").innerText = data.timestamp_low;
     document.getElementById("message_low").innerText = data.message_num_low;
     document.getElementById("registration_low").innerText = data.registration_low;
+
+    var approaching = document.getElementById("approaching");
+    approaching.innerHTML = "";
+    (data.approaching || []).forEach(function(plane) {
+        var row = approaching.insertRow();
+        [plane.callsign, plane.distance, plane.closest_distance, plane.time_to_closest].forEach(function(value) {
+            row.insertCell().innerText = value;
+        });
+    });
+
+    var observers = document.getElementById("observers");
+    observers.innerHTML = "";
+    (data.observers || []).forEach(function(observer) {
+        var row = observers.insertRow();
+        [observer.name, observer.callsign, observer.distance, observer.callsign_low, observer.distance_low].forEach(
+            function(value) {
+                row.insertCell().innerText = value;
+            });
+    });
+
+    var geofenceEvents = document.getElementById("geofence_events");
+    geofenceEvents.innerHTML = "";
+    (data.geofence_events || []).forEach(function(event) {
+        var row = geofenceEvents.insertRow();
+        [event.timestamp, event.zone, event.callsign, event.event, event.altitude].forEach(function(value) {
+            row.insertCell().innerText = value;
+        });
+    });
 };
\ No newline at end of file
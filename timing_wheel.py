@@ -0,0 +1,67 @@
+import time
+from typing import Hashable
+
+
+class TimingWheel:
+    """
+    Hashed timing wheel driven by the monotonic clock.
+
+    Keys are scheduled to expire after a timeout. Rescheduling a key only updates its deadline, so refreshing an
+    aircraft on every message costs a single dict write. Keys are placed in the slot of their deadline and are
+    re-armed lazily when that slot comes up while their deadline has been pushed further into the future.
+    """
+
+    def __init__(self, tick_in_seconds: float, num_slots: int):
+        self.tick_in_seconds = tick_in_seconds
+        self.num_slots = num_slots
+        self.slots: list[set[Hashable]] = [set() for _ in range(num_slots)]
+        self.deadlines: dict[Hashable, int] = {}
+        self.current_tick = self.tick_at(time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self.deadlines)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.deadlines
+
+    def tick_at(self, timestamp: float) -> int:
+        return int(timestamp / self.tick_in_seconds)
+
+    def schedule(self, key: Hashable, timeout_in_seconds: float, now: float | None = None):
+        now = time.monotonic() if now is None else now
+        deadline = self.tick_at(now + timeout_in_seconds) + 1
+        previous_deadline = self.deadlines.get(key)
+        self.deadlines[key] = deadline
+        if previous_deadline is None or deadline < previous_deadline:
+            self.slots[deadline % self.num_slots].add(key)
+
+    def cancel(self, key: Hashable):
+        self.deadlines.pop(key, None)
+
+    def advance(self, now: float | None = None) -> list[Hashable]:
+        """Moves the wheel to the current time and returns all keys whose deadline has passed."""
+        target_tick = self.tick_at(time.monotonic() if now is None else now)
+        if target_tick <= self.current_tick:
+            return []
+
+        expired = []
+        # After a stall longer than one revolution, every slot has to be visited exactly once.
+        first_tick = max(self.current_tick + 1, target_tick - self.num_slots + 1)
+        for tick in range(first_tick, target_tick + 1):
+            slot_index = tick % self.num_slots
+            slot = self.slots[slot_index]
+            if not slot:
+                continue
+            self.slots[slot_index] = set()
+            for key in slot:
+                deadline = self.deadlines.get(key)
+                if deadline is None:
+                    continue
+                if deadline <= target_tick:
+                    del self.deadlines[key]
+                    expired.append(key)
+                else:
+                    self.slots[deadline % self.num_slots].add(key)
+
+        self.current_tick = target_tick
+        return expired
@@ -0,0 +1,63 @@
+import json
+import socket
+import struct
+import time
+
+FRAME_HEADER = struct.Struct(">I")  # length of the JSON payload
+MAX_FRAME_SIZE = 1024 * 1024
+SEND_TIMEOUT_IN_SECONDS = 0.5
+RECONNECT_INTERVAL_IN_SECONDS = 5
+SUBSCRIBE_FRAME = FRAME_HEADER.pack(0)  # sent by a server worker to receive all updates
+
+
+def encode_frame(data: dict) -> bytes:
+    payload = json.dumps(data, separators=(",", ":")).encode()
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class UpdateChannel:
+    """
+    Persistent connection from the data processor to the planeradar_server over a Unix domain socket.
+
+    Every update is sent as one length-prefixed JSON frame, so the server can pass it on to the WebSocket clients as
+    it is. A frame that cannot be sent in time closes the connection, since the server could not find the start of the
+    next frame after a partial one. The connection is retried at most every few seconds.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.connection: socket.socket | None = None
+        self.next_attempt = 0.0
+
+    def send(self, data: dict) -> bool:
+        """Sends the update. Returns False if the server could not be reached."""
+        if self.connection is None and not self.connect():
+            return False
+        try:
+            self.connection.sendall(encode_frame(data))
+            return True
+        except OSError as e:
+            print(f"Update channel to {self.path} lost ({e}).")
+            self.close()
+            return False
+
+    def connect(self) -> bool:
+        now = time.monotonic()
+        if now < self.next_attempt:
+            return False
+        self.next_attempt = now + RECONNECT_INTERVAL_IN_SECONDS
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.settimeout(SEND_TIMEOUT_IN_SECONDS)
+        try:
+            connection.connect(self.path)
+        except OSError:
+            connection.close()
+            return False
+        print(f"Update channel to {self.path} connected.")
+        self.connection = connection
+        return True
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
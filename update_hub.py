@@ -0,0 +1,98 @@
+import asyncio
+import fcntl
+import os
+
+from update_channel import FRAME_HEADER, MAX_FRAME_SIZE
+
+MAX_SUBSCRIBER_BACKLOG_IN_BYTES = 4 * 1024 * 1024
+
+
+async def read_frame(reader: asyncio.StreamReader) -> bytes | None:
+    """Returns the JSON payload of the next frame, empty for a subscription and None if the channel was closed."""
+    try:
+        header = await reader.readexactly(FRAME_HEADER.size)
+        (length,) = FRAME_HEADER.unpack(header)
+        if length > MAX_FRAME_SIZE:
+            raise ValueError(f"Frame of {length} bytes exceeds the maximum frame size.")
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        return None
+
+
+class UpdateHub:
+    """
+    Local pub/sub hub on the Unix domain socket of the update channel, run by one of the planeradar_server workers.
+
+    Every connection may publish updates as frames, the data processor as well as the workers receiving a POST request.
+    A connection that sends an empty frame subscribes and receives every update published afterwards, starting with
+    the latest one. The hub only forwards the frames, it does not decode them. A subscriber that does not keep up is
+    disconnected instead of buffering updates for it, since it gets the latest state when it subscribes again.
+
+    The workers compete for a lock file next to the socket, so exactly one of them runs the hub and another one takes
+    over once that worker is gone.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers: set[asyncio.StreamWriter] = set()
+        self.latest_frame: bytes | None = None
+        self.lock_file = None
+        self.server: asyncio.Server | None = None
+
+    async def start(self) -> bool:
+        """Starts the hub unless it is already run by this or another process. Returns True if it runs here."""
+        if self.server is not None:
+            return True
+        lock_file = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        if os.path.exists(self.path):
+            os.unlink(self.path)  # left over from a previous run.
+        self.server = await asyncio.start_unix_server(self.handle_connection, path=self.path)
+        self.lock_file = lock_file
+        print(f"Update hub listening on {self.path}.")
+        return True
+
+    async def stop(self):
+        if self.server is None:
+            return
+        self.server.close()
+        for subscriber in self.subscribers:
+            subscriber.close()
+        await self.server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.lock_file.close()
+        self.server = None
+        self.lock_file = None
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while (payload := await read_frame(reader)) is not None:
+                if payload:
+                    self.publish(FRAME_HEADER.pack(len(payload)) + payload)
+                else:
+                    self.subscribe(writer)
+        except (OSError, ValueError) as e:
+            print(f"Update hub connection closed ({e}).")
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def subscribe(self, writer: asyncio.StreamWriter):
+        self.subscribers.add(writer)
+        if self.latest_frame is not None:
+            writer.write(self.latest_frame)
+
+    def publish(self, frame: bytes):
+        self.latest_frame = frame
+        for subscriber in list(self.subscribers):
+            if subscriber.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BACKLOG_IN_BYTES:
+                print("Update hub dropped a subscriber that does not keep up.")
+                self.subscribers.discard(subscriber)
+                subscriber.close()
+            else:
+                subscriber.write(frame)